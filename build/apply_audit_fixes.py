@@ -2,15 +2,20 @@
 """Apply audit fixes from audit_report.json to per-chapter JSON and content.json.
 
 Reads the audit report, updates linked_concept_id on each mismatched question,
-rebuilds level3_question_ids arrays, and writes updated files.
+rebuilds level3_question_ids arrays, and writes updated files. Chapters whose
+fixes are already applied are skipped unless --force is given.
 
 Usage:
-    python3 build/apply_audit_fixes.py
+    python3 build/apply_audit_fixes.py [--force]
 """
 
 import json
 import os
-import re
+import sys
+
+from content_store import ContentStore
+from incremental import BuildManifest, chapter_path, hash_file, hash_json
+from term_matcher import TermMatcher, question_text
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -18,30 +23,7 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 REPORT_PATH = os.path.join(SCRIPT_DIR, "audit_report.json")
 CONTENT_PATH = os.path.join(DATA_DIR, "content.json")
 
-
-def find_term_in_text(term, text):
-    """Check if a vocab term appears in text (case-insensitive, word boundary)."""
-    term_lower = term.lower().strip()
-    text_lower = text.lower().strip()
-    if len(term_lower) < 3:
-        return False
-    pattern = r'\b' + re.escape(term_lower) + r'\b'
-    if re.search(pattern, text_lower):
-        return True
-    paren_match = re.match(r'^(.+?)\s*\(([^)]+)\)\s*$', term_lower)
-    if paren_match:
-        base = paren_match.group(1).strip()
-        abbrev = paren_match.group(2).strip()
-        if len(base) >= 3 and re.search(r'\b' + re.escape(base) + r'\b', text_lower):
-            return True
-        if len(abbrev) >= 2 and re.search(r'\b' + re.escape(abbrev) + r'\b', text_lower):
-            return True
-    if '/' in term_lower:
-        for part in term_lower.split('/'):
-            part = part.strip()
-            if len(part) >= 3 and re.search(r'\b' + re.escape(part) + r'\b', text_lower):
-                return True
-    return False
+STAGE = "apply_audit_fixes"
 
 
 def rebuild_level3_ids(chapter):
@@ -49,88 +31,98 @@ def rebuild_level3_ids(chapter):
     for concept in chapter["concepts"]:
         concept["level3_question_ids"] = []
 
+    concepts_by_id = {c["id"]: c for c in chapter["concepts"]}
+    matcher = TermMatcher(chapter["concepts"])
     for q in chapter["chapter_questions"]:
-        full_text = q["question"] + " " + " ".join(q["choices"])
-        for concept in chapter["concepts"]:
-            if find_term_in_text(concept["term"], full_text):
-                concept["level3_question_ids"].append(q["id"])
-
-
-def main():
-    if not os.path.exists(REPORT_PATH):
-        print(f"No audit report found at {REPORT_PATH}")
-        print("Run audit_question_links.py first.")
-        return
+        for cid in matcher.match(question_text(q)):
+            concepts_by_id[cid]["level3_question_ids"].append(q["id"])
 
-    with open(REPORT_PATH) as f:
-        mismatches = json.load(f)
 
-    if not mismatches:
-        print("No mismatches to fix.")
-        return
+def apply_fixes(store, build_manifest, mismatches, force=False):
+    """Relink mismatched questions through a ContentStore and commit.
 
+    Records each rewritten chapter in build_manifest (the caller saves it).
+    Returns ({chapter_id: fixes applied}, chapters skipped as up to date).
+    """
     # Group by chapter
     fixes_by_chapter = {}
     for m in mismatches:
         fixes_by_chapter.setdefault(m["chapter"], []).append(m)
 
-    affected_chapters = {}
-    total_fixed = 0
+    inputs_hashes = {}
+    fixed_counts = {}
+    unchanged = 0
 
     for ch_id, fixes in sorted(fixes_by_chapter.items()):
-        ch_path = os.path.join(DATA_DIR, f"{ch_id}.json")
-        with open(ch_path) as f:
-            chapter = json.load(f)
+        # Skip chapters whose fixes were already applied to the current file
+        inputs_hash = hash_json(fixes)
+        current_hash = hash_file(chapter_path(ch_id, store.data_dir))
+        if not force and build_manifest.is_clean(STAGE, ch_id, inputs_hash, current_hash):
+            unchanged += 1
+            continue
+
+        store.edit(ch_id)
+        inputs_hashes[ch_id] = inputs_hash
 
-        questions_by_id = {q["id"]: q for q in chapter["chapter_questions"]}
-        concepts_by_id = {c["id"]: c for c in chapter["concepts"]}
+        def term(cid):
+            if cid and store.chapter_of_concept(cid) == ch_id:
+                return store.concept(cid)["term"]
+            return "none"
 
         ch_fixed = 0
         for fix in fixes:
-            q = questions_by_id.get(fix["question_id"])
-            if q is None:
+            q = store.question(fix["question_id"])
+            if q is None or store.chapter_of_question(fix["question_id"]) != ch_id:
                 print(f"  WARNING: Q{fix['question_id']} not found in {ch_id}")
                 continue
 
             new_link = fix["suggested_link"]
             # Validate the suggested concept exists in this chapter
-            if new_link and new_link not in concepts_by_id:
+            if new_link and store.chapter_of_concept(new_link) != ch_id:
                 print(f"  WARNING: Q{fix['question_id']} suggested {new_link} not in {ch_id}, skipping")
                 continue
 
             old_link = q["linked_concept_id"]
             q["linked_concept_id"] = new_link
-            old_term = concepts_by_id[old_link]["term"] if old_link and old_link in concepts_by_id else "none"
-            new_term = concepts_by_id[new_link]["term"] if new_link and new_link in concepts_by_id else "none"
-            print(f"  Q{fix['question_id']}: {old_link} ({old_term}) -> {new_link} ({new_term})")
+            print(f"  Q{fix['question_id']}: {old_link} ({term(old_link)}) -> {new_link} ({term(new_link)})")
             ch_fixed += 1
 
         # NOTE: level3_question_ids rebuild is handled by rebuild_level3_llm.py
         # Do NOT use regex-based rebuild here
 
-        # Write per-chapter file
-        with open(ch_path, "w") as f:
-            json.dump(chapter, f, indent=2)
-
-        affected_chapters[ch_id] = chapter
-        total_fixed += ch_fixed
+        fixed_counts[ch_id] = ch_fixed
         print(f"  {ch_id}: {ch_fixed} fixes applied")
 
-    # Rebuild content.json with all chapters (including unmodified ones)
-    with open(CONTENT_PATH) as f:
-        content = json.load(f)
+    # Write the edited chapters and splice them into content.json
+    for ch_id, output_hash in store.commit().items():
+        build_manifest.record(STAGE, ch_id, inputs_hashes[ch_id], output_hash)
+    return fixed_counts, unchanged
+
+
+def main(force=False):
+    if not os.path.exists(REPORT_PATH):
+        print(f"No audit report found at {REPORT_PATH}")
+        print("Run audit_question_links.py first.")
+        return
 
-    for i, ch in enumerate(content["chapters"]):
-        if ch["id"] in affected_chapters:
-            content["chapters"][i] = affected_chapters[ch["id"]]
+    with open(REPORT_PATH) as f:
+        mismatches = json.load(f)
+
+    if not mismatches:
+        print("No mismatches to fix.")
+        return
 
-    with open(CONTENT_PATH, "w") as f:
-        json.dump(content, f, indent=2)
+    store = ContentStore(DATA_DIR)
+    build_manifest = BuildManifest()
+    fixed_counts, unchanged = apply_fixes(store, build_manifest, mismatches, force)
+    build_manifest.save()
+    total_fixed = sum(fixed_counts.values())
 
-    print(f"\nApplied {total_fixed} fixes across {len(affected_chapters)} chapters")
-    print(f"Updated: {', '.join(sorted(affected_chapters.keys()))}")
+    print(f"\nApplied {total_fixed} fixes across {len(fixed_counts)} chapters "
+          f"({unchanged} chapters already up to date)")
+    print(f"Updated: {', '.join(sorted(fixed_counts))}")
     print(f"Wrote: {CONTENT_PATH}")
 
 
 if __name__ == "__main__":
-    main()
+    main(force="--force" in sys.argv)
@@ -7,17 +7,19 @@
 
 Sends batches of questions to Claude, asking which concept each question
 primarily tests. Outputs mismatches as audit_report.json and audit_report.md.
+Batches run concurrently and responses that answer every question in their
+batch are cached in build/.llm_cache/, so an interrupted or repeated audit
+only pays for batches that changed; pass --refresh to ignore the cache.
 
 Usage:
-    ANTHROPIC_API_KEY=sk-... uv run build/audit_question_links.py
+    ANTHROPIC_API_KEY=sk-... uv run build/audit_question_links.py [--refresh]
 """
 
 import json
 import os
 import sys
-import time
 
-import anthropic
+from llm_runner import DEFAULT_CACHE_DIR, BatchRunner
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -26,8 +28,10 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 REPORT_JSON = os.path.join(SCRIPT_DIR, "audit_report.json")
 REPORT_MD = os.path.join(SCRIPT_DIR, "audit_report.md")
 
+MODEL = "claude-haiku-4-5-20251001"
 BATCH_SIZE = 10  # questions per API call
-RATE_LIMIT_DELAY = 0.5  # seconds between API calls
+CONCURRENCY = 4  # API calls in flight
+REQUESTS_PER_SECOND = 2.0
 
 
 def load_chapter(chapter_id):
@@ -62,12 +66,12 @@ def build_question_list(questions, concepts_by_id):
     return "\n\n".join(lines)
 
 
-def audit_batch(client, chapter_name, concepts, questions, concepts_by_id):
-    """Send a batch of questions to Claude for audit. Returns list of (qid, suggested_id)."""
+def build_audit_prompt(chapter_name, concepts, questions, concepts_by_id):
+    """Prompt asking which concept each question in a batch primarily tests."""
     concept_list = build_concept_list(concepts)
     question_list = build_question_list(questions, concepts_by_id)
 
-    prompt = f"""You are auditing a sociology exam review app. For each question below, determine which concept from the chapter it PRIMARILY tests.
+    return f"""You are auditing a sociology exam review app. For each question below, determine which concept from the chapter it PRIMARILY tests.
 
 Chapter: {chapter_name}
 
@@ -86,14 +90,10 @@ Q123: ch07_t05
 Q124: ch07_t12
 Q125: none"""
 
-    response = client.messages.create(
-        model="claude-haiku-4-5-20251001",
-        max_tokens=2000,
-        messages=[{"role": "user", "content": prompt}],
-    )
 
+def parse_audit_response(text):
+    """Parse "Q<id>: <concept_id>" lines. Returns list of (qid, suggested_id)."""
     results = []
-    text = response.content[0].text
     for line in text.strip().split("\n"):
         line = line.strip()
         if not line or not line.startswith("Q"):
@@ -112,18 +112,36 @@ Q125: none"""
     return results
 
 
-def main():
-    client = anthropic.Anthropic()
+def answers_batch(batch, text):
+    """Whether a response has a line for every question in the batch."""
+    return {q["id"] for q in batch} <= {qid for qid, _ in parse_audit_response(text)}
+
+
+def main(client=None, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    if client is None:
+        # Imported here so the prompt builders work without it
+        import anthropic
+        client = anthropic.Anthropic()
+    runner = BatchRunner(
+        client,
+        model=MODEL,
+        max_tokens=2000,
+        concurrency=CONCURRENCY,
+        requests_per_second=REQUESTS_PER_SECOND,
+        cache_dir=cache_dir,
+        refresh=refresh,
+    )
 
     # Load chapter manifest
     manifest_path = os.path.join(DATA_DIR, "chapters.json")
     with open(manifest_path) as f:
         manifest = json.load(f)
 
-    mismatches = []
-    total_audited = 0
-    total_mismatched = 0
-
+    # Build every batch prompt up front so the runner can send them
+    # concurrently; responses are cached, so a rerun only pays for batches
+    # whose questions or concepts changed
+    jobs = []  # (chapter info, concepts_by_id, batch)
+    prompts = []
     for ch_info in manifest:
         chapter = load_chapter(ch_info["id"])
         concepts = chapter["concepts"]
@@ -134,42 +152,53 @@ def main():
             print(f"{ch_info['id']} {ch_info['name']}: no linked questions, skipping")
             continue
 
-        print(f"{ch_info['id']} {ch_info['name']}: auditing {len(questions)} questions...")
-
-        # Process in batches
-        chapter_mismatches = 0
         for i in range(0, len(questions), BATCH_SIZE):
             batch = questions[i:i + BATCH_SIZE]
-            results = audit_batch(client, ch_info["name"], concepts, batch, concepts_by_id)
-
-            # Build lookup for this batch
-            batch_by_id = {q["id"]: q for q in batch}
-
-            for qid, suggested in results:
-                q = batch_by_id.get(qid)
-                if q is None:
-                    continue
-                total_audited += 1
-                current = q["linked_concept_id"]
-                if suggested != current:
-                    current_term = concepts_by_id[current]["term"] if current and current in concepts_by_id else "none"
-                    suggested_term = concepts_by_id[suggested]["term"] if suggested and suggested in concepts_by_id else "none"
-                    mismatches.append({
-                        "question_id": qid,
-                        "chapter": ch_info["id"],
-                        "question_text": q["question"],
-                        "current_link": current,
-                        "suggested_link": suggested,
-                        "current_term": current_term,
-                        "suggested_term": suggested_term,
-                    })
-                    chapter_mismatches += 1
-                    total_mismatched += 1
-
-            if i + BATCH_SIZE < len(questions):
-                time.sleep(RATE_LIMIT_DELAY)
-
-        print(f"  -> {chapter_mismatches} mismatches found")
+            jobs.append((ch_info, concepts_by_id, batch))
+            prompts.append(build_audit_prompt(ch_info["name"], concepts, batch, concepts_by_id))
+
+    print(f"Auditing {sum(len(batch) for _, _, batch in jobs)} questions "
+          f"in {len(prompts)} batches...", end="", flush=True)
+    texts = runner.run(
+        prompts,
+        on_done=lambda i, text: print(".", end="", flush=True),
+        validate=lambda i, text: answers_batch(jobs[i][2], text),
+    )
+    print(f"\n  {runner.api_calls} API calls, {runner.cache_hits} cached\n")
+
+    mismatches = []
+    total_audited = 0
+    total_mismatched = 0
+    mismatches_by_chapter = {}
+
+    for (ch_info, concepts_by_id, batch), text in zip(jobs, texts):
+        results = parse_audit_response(text)
+        batch_by_id = {q["id"]: q for q in batch}
+
+        for qid, suggested in results:
+            q = batch_by_id.get(qid)
+            if q is None:
+                continue
+            total_audited += 1
+            current = q["linked_concept_id"]
+            if suggested != current:
+                current_term = concepts_by_id[current]["term"] if current and current in concepts_by_id else "none"
+                suggested_term = concepts_by_id[suggested]["term"] if suggested and suggested in concepts_by_id else "none"
+                mismatches.append({
+                    "question_id": qid,
+                    "chapter": ch_info["id"],
+                    "question_text": q["question"],
+                    "current_link": current,
+                    "suggested_link": suggested,
+                    "current_term": current_term,
+                    "suggested_term": suggested_term,
+                })
+                mismatches_by_chapter[ch_info["id"]] = mismatches_by_chapter.get(ch_info["id"], 0) + 1
+                total_mismatched += 1
+
+    for ch_info in manifest:
+        print(f"{ch_info['id']} {ch_info['name']}: "
+              f"{mismatches_by_chapter.get(ch_info['id'], 0)} mismatches found")
 
     # Write JSON report
     with open(REPORT_JSON, "w") as f:
@@ -208,4 +237,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(refresh="--refresh" in sys.argv)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Benchmark the build pipeline on synthetic corpora.
+
+Each stage runs against a corpus from synthetic_corpus.py, entirely in a
+temporary directory (data/ and the build manifests are never touched):
+
+    link         build_chapter: term linking and chapter assembly
+    confusables  ConfusableIndex top-5 neighbours for every concept
+    serialize    chapter files, chapters.json, spliced content.json and the
+                 compact publish encoding
+    audit_fixes  ContentStore index build plus apply_fixes for a synthetic
+                 audit report relinking 30% of questions
+    llm_batch    BatchRunner over the level-3 relevance prompts, against a
+                 StubClient with --latency seconds per call
+    llm_stream   streamed question generation (parser + md output), against
+                 a StubClient
+
+Timings are the best of --repeat runs; peak memory comes from one extra run
+under tracemalloc. The LLM stages never touch the network and run without
+the anthropic package installed.
+
+Usage:
+    python3 build/benchmark.py [--scale 1 10 100] [--stages link serialize]
+        [--repeat N] [--latency S] [--json out.json] [--compare baseline.json]
+        [--profile DIR] [--trace-alloc]
+
+    --profile DIR   run each stage under cProfile, print the top functions and
+                    save DIR/<stage>-x<scale>.prof
+    --trace-alloc   print the top allocation sites of each stage
+    --compare FILE  compare against an earlier --json run; exits 1 if a stage
+                    got more than --tolerance slower
+"""
+
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from build_content import build_chapter
+from confusables_engine import ConfusableIndex
+from content_store import ContentStore
+from incremental import BuildManifest, splice_content, write_chapter, write_chapter_manifest
+from llm_runner import BatchRunner, StubClient
+from publish_content import encode_chapter, minify
+from synthetic_corpus import audit_mismatches, generate_corpus
+
+DEFAULT_SCALES = [1, 10]
+DEFAULT_REPEAT = 3
+DEFAULT_LATENCY = 0.005  # seconds per stubbed API call
+DEFAULT_TOLERANCE = 0.25  # fraction slower than baseline that counts as a regression
+PROFILE_TOP = 15
+
+
+# --- Stages ---
+#
+# setup(ctx, workdir) prepares untimed state; run(ctx, state) is timed and
+# returns a short description of the work done.
+
+def setup_nothing(ctx, workdir):
+    return workdir
+
+
+def run_link(ctx, _):
+    chapters = [
+        build_chapter(i, ch["name"], ch["terms"], ch["questions"])
+        for i, ch in enumerate(ctx["corpus"], start=1)
+    ]
+    ctx["chapters"] = chapters
+    questions = [q for ch in chapters for q in ch["chapter_questions"]]
+    linked = sum(1 for q in questions if q["linked_concept_id"])
+    return f"{linked}/{len(questions)} questions linked"
+
+
+def run_confusables(ctx, _):
+    index = ConfusableIndex(ctx["chapters"])
+    confusables = index.confusable_map()
+    for chapter in ctx["chapters"]:
+        for concept in chapter["concepts"]:
+            concept["confusable_ids"] = confusables[concept["id"]]
+    return f"{len(confusables)} concepts"
+
+
+def run_serialize(ctx, data_dir):
+    chapters = ctx["chapters"]
+    for chapter in chapters:
+        write_chapter(chapter, data_dir)
+    write_chapter_manifest(chapters, data_dir)
+    splice_content([ch["id"] for ch in chapters], data_dir)
+    compact = sum(len(minify(encode_chapter(ch))) for ch in chapters)
+    size = os.path.getsize(os.path.join(data_dir, "content.json"))
+    ctx["data_dir"] = data_dir
+    return f"content.json {size / 1e6:.1f} MB, compact {compact / 1e6:.1f} MB"
+
+
+def setup_audit_fixes(ctx, workdir):
+    if "data_dir" not in ctx:
+        source = os.path.join(workdir, "source")
+        os.makedirs(source)
+        run_serialize(ctx, source)
+    data_dir = os.path.join(workdir, "data")
+    shutil.copytree(ctx["data_dir"], data_dir)
+    return data_dir
+
+
+def run_audit_fixes(ctx, data_dir):
+    from apply_audit_fixes import apply_fixes
+
+    workdir = os.path.dirname(data_dir)
+    store = ContentStore(data_dir, os.path.join(workdir, "content_index.json"))
+    manifest = BuildManifest(os.path.join(workdir, "build_manifest.json"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        fixed, _ = apply_fixes(store, manifest, ctx["mismatches"], force=True)
+    return f"{sum(fixed.values())} fixes in {len(fixed)} chapters"
+
+
+def relevance_respond(prompt):
+    """Stub answer: every question maps to the first listed concept."""
+    first = re.search(r"^- (\S+):", prompt, re.M).group(1)
+    return "\n".join(f"Q{qid}: {first}" for qid in re.findall(r"^Q(\d+)$", prompt, re.M))
+
+
+def run_llm_batch(ctx, _):
+    from rebuild_level3_llm import BATCH_SIZE, CONCURRENCY, build_relevance_prompt, parse_relevance_response
+
+    jobs = []
+    for chapter in ctx["chapters"]:
+        questions = chapter["chapter_questions"]
+        for i in range(0, len(questions), BATCH_SIZE):
+            jobs.append((chapter, build_relevance_prompt(
+                chapter["name"], chapter["concepts"], questions[i:i + BATCH_SIZE])))
+    client = StubClient(relevance_respond, latency=ctx["latency"])
+    runner = BatchRunner(
+        client, model="stub", max_tokens=4000,
+        concurrency=CONCURRENCY, requests_per_second=None, cache_dir=None,
+    )
+    texts = runner.run([prompt for _, prompt in jobs])
+    mapped = sum(
+        len(parse_relevance_response(text, chapter["concepts"]))
+        for (chapter, _), text in zip(jobs, texts)
+    )
+    return f"{client.calls} calls, {mapped} questions mapped"
+
+
+def generation_respond(prompt):
+    """Stub answer: three well-formed questions per concept in the prompt."""
+    section = prompt.split("Concepts needing questions", 1)[1].split("Use the following", 1)[0]
+    lines = []
+    for n, term in enumerate(re.findall(r"^- (.+?): ", section, re.M) * 3, start=1):
+        lines.append(f"{n}. Which scenario best illustrates {term}?\n"
+                     f"a) Not it\n*b) A case of {term}\nc) Not it\nd) Not it\n"
+                     f"**Explanation:** Because.\n")
+    return "\n".join(lines)
+
+
+def run_llm_stream(ctx, workdir):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from generate_questions import CONCURRENCY, ChapterOutput, build_prompt, generate_batch
+
+    client = StubClient(generation_respond, latency=ctx["latency"], chunk_size=40)
+    jobs = []
+    for chapter in ctx["chapters"]:
+        output = ChapterOutput(os.path.join(workdir, f"{chapter['id']}.md"), chapter["name"])
+        for concept in chapter["concepts"][:5]:
+            prompt = build_prompt([concept], concept["definition"], chapter["name"])
+            jobs.append((chapter["name"], [concept], prompt, output))
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            saved = sum(pool.map(lambda job: generate_batch(client, *job), jobs))
+    return f"{client.calls} streams, {saved} questions saved"
+
+
+STAGES = {
+    "link": (setup_nothing, run_link),
+    "confusables": (setup_nothing, run_confusables),
+    "serialize": (setup_nothing, run_serialize),
+    "audit_fixes": (setup_audit_fixes, run_audit_fixes),
+    "llm_batch": (setup_nothing, run_llm_batch),
+    "llm_stream": (setup_nothing, run_llm_stream),
+}
+
+
+# --- Measurement ---
+
+def measure(stage, ctx, repeat, profile_dir=None, trace_alloc=False):
+    """Best-of-repeat seconds and tracemalloc peak (MB) for one stage."""
+    setup, run = STAGES[stage]
+
+    def once(hook=None):
+        workdir = tempfile.mkdtemp(dir=ctx["tmp"])
+        state = setup(ctx, workdir)
+        start = time.perf_counter()
+        with hook or contextlib.nullcontext():
+            detail = run(ctx, state)
+        return time.perf_counter() - start, detail
+
+    best = float("inf")
+    for _ in range(repeat):
+        seconds, detail = once()
+        best = min(best, seconds)
+
+    tracemalloc.start()
+    try:
+        once()
+        _, peak = tracemalloc.get_traced_memory()
+        if trace_alloc:
+            print(f"\n  top allocations, {stage}:")
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:10]:
+                print(f"    {stat}")
+    finally:
+        tracemalloc.stop()
+
+    if profile_dir:
+        profiler = cProfile.Profile()
+        once(profiler)
+        path = os.path.join(profile_dir, f"{stage}-x{ctx['scale']:g}.prof")
+        profiler.dump_stats(path)
+        print(f"\n  cProfile, {stage} (saved {path}):")
+        stats = pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative")
+        stats.print_stats(PROFILE_TOP)
+
+    return best, peak / 1e6, detail
+
+
+def run_scale(scale, stages, repeat, latency, profile_dir=None, trace_alloc=False):
+    corpus = generate_corpus(scale)
+    n_terms = sum(len(ch["terms"]) for ch in corpus)
+    n_questions = sum(len(ch["questions"]) for ch in corpus)
+    print(f"\nScale x{scale:g}: {len(corpus)} chapters, {n_terms} terms, {n_questions} questions")
+    print(f"  {'stage':<12} {'best s':>9} {'peak MB':>9}  detail")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="soci101-bench-") as tmp:
+        ctx = {"corpus": corpus, "scale": scale, "latency": latency, "tmp": tmp}
+        # Later stages work on the linked chapters and their audit report
+        run_link(ctx, None)
+        ctx["mismatches"] = audit_mismatches(ctx["chapters"])
+        for stage in stages:
+            seconds, peak_mb, detail = measure(stage, ctx, repeat, profile_dir, trace_alloc)
+            print(f"  {stage:<12} {seconds:>9.3f} {peak_mb:>9.1f}  {detail}")
+            results.append({"stage": stage, "scale": scale, "seconds": seconds, "peak_mb": peak_mb})
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Print timing ratios against a baseline run. Returns the regressed stages."""
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["scale"]): r for r in json.load(f)["results"]}
+    print(f"\nAgainst {baseline_path}:")
+    regressions = []
+    for r in results:
+        old = baseline.get((r["stage"], r["scale"]))
+        if old is None:
+            continue
+        ratio = r["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(r)
+        print(f"  {r['stage']:<12} x{r['scale']:<5g} {old['seconds']:>9.3f} -> "
+              f"{r['seconds']:>9.3f}s ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results from an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--profile", metavar="DIR", help="cProfile each stage, saving .prof files here")
+    parser.add_argument("--trace-alloc", action="store_true", help="show top allocation sites")
+    args = parser.parse_args()
+
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    results = []
+    for scale in args.scale:
+        results.extend(run_scale(
+            scale, args.stages, args.repeat, args.latency, args.profile, args.trace_alloc))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
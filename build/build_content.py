@@ -1,9 +1,24 @@
 #!/usr/bin/env python3
-"""Build unified content.json from vocabulary.json and questions.json."""
+"""Build unified content.json from vocabulary.json and questions.json.
+
+Only chapters whose vocab terms or YAQ3 questions changed since the last
+run are rebuilt; pass --force to rebuild every chapter.
+"""
 
 import json
-import re
 import os
+import sys
+
+from incremental import (
+    BuildManifest,
+    chapter_path,
+    hash_json,
+    load_chapter,
+    splice_content,
+    write_chapter,
+    write_chapter_manifest,
+)
+from term_matcher import link_questions
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -12,6 +27,8 @@ VOCAB_PATH = os.path.join(PROJECT_ROOT, "Old-games/soci101-vocab-quiz-html/vocab
 QUESTIONS_PATH = os.path.join(PROJECT_ROOT, "Old-games/yaq3/questions.json")
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "data/content.json")
 
+STAGE = "build_content"
+
 # Maps vocab chapter names to YAQ3 chapter names
 CHAPTER_MAP = {
     "Sociological Perspective": "01 Perspectives",
@@ -61,40 +78,46 @@ def make_concept_id(chapter_id, term_index):
     return f"{chapter_id}_t{term_index:02d}"
 
 
-def normalize_for_matching(text):
-    """Normalize text for term matching in questions."""
-    return text.lower().strip()
-
-
-def find_term_in_text(term, text):
-    """Check if a vocab term appears in question text (case-insensitive, word boundary)."""
-    term_lower = normalize_for_matching(term)
-    text_lower = normalize_for_matching(text)
-    # Use word boundaries for terms with 3+ characters
-    if len(term_lower) < 3:
-        return False
-    pattern = r'\b' + re.escape(term_lower) + r'\b'
-    if re.search(pattern, text_lower):
-        return True
-    # Try matching without parenthetical abbreviations: "Socioeconomic Status (SES)" -> match "socioeconomic status" or "SES"
-    paren_match = re.match(r'^(.+?)\s*\(([^)]+)\)\s*$', term_lower)
-    if paren_match:
-        base = paren_match.group(1).strip()
-        abbrev = paren_match.group(2).strip()
-        if len(base) >= 3 and re.search(r'\b' + re.escape(base) + r'\b', text_lower):
-            return True
-        if len(abbrev) >= 2 and re.search(r'\b' + re.escape(abbrev) + r'\b', text_lower):
-            return True
-    # Try matching slash-separated terms: "Frontstage/Backstage" -> match either part
-    if '/' in term_lower:
-        for part in term_lower.split('/'):
-            part = part.strip()
-            if len(part) >= 3 and re.search(r'\b' + re.escape(part) + r'\b', text_lower):
-                return True
-    return False
-
-
-def build_content():
+def build_chapter(order_idx, vocab_chapter, terms, yaq3_questions):
+    chapter_id = make_chapter_id(order_idx)
+
+    # Build concepts from vocab terms
+    concepts = []
+    for term_idx, term_entry in enumerate(terms, start=1):
+        concept_id = make_concept_id(chapter_id, term_idx)
+        concepts.append({
+            "id": concept_id,
+            "term": term_entry["word"],
+            "definition": term_entry["definition"],
+            "level3_question_ids": [],
+        })
+
+    # Link YAQ3 questions to concepts by term matching (question text
+    # plus choices), longest terms first
+    links, level3_ids = link_questions(concepts, yaq3_questions)
+    for concept in concepts:
+        concept["level3_question_ids"] = level3_ids[concept["id"]]
+
+    chapter_questions = []
+    for q, linked_concept_id in zip(yaq3_questions, links):
+        chapter_questions.append({
+            "id": q["id"],
+            "question": q["question"],
+            "choices": q["choices"],
+            "correct": q["correct"],
+            "linked_concept_id": linked_concept_id,
+        })
+
+    return {
+        "id": chapter_id,
+        "name": vocab_chapter,
+        "order": order_idx,
+        "concepts": concepts,
+        "chapter_questions": chapter_questions,
+    }
+
+
+def build_content(force=False):
     with open(VOCAB_PATH) as f:
         vocab_data = json.load(f)
     with open(QUESTIONS_PATH) as f:
@@ -106,76 +129,48 @@ def build_content():
         ch = q["chapter"]
         yaq3_by_chapter.setdefault(ch, []).append(q)
 
-    chapters = []
+    data_dir = os.path.dirname(OUTPUT_PATH)
+    os.makedirs(data_dir, exist_ok=True)
+    build_manifest = BuildManifest()
+
+    manifest_entries = []
+    chapters = []  # every chapter, as now on disk
+    rebuilt = 0
 
     for order_idx, vocab_chapter in enumerate(CHAPTER_ORDER, start=1):
         chapter_id = make_chapter_id(order_idx)
+        manifest_entries.append({"id": chapter_id, "name": vocab_chapter, "order": order_idx})
         terms = vocab_data.get(vocab_chapter, [])
         yaq3_chapter = CHAPTER_MAP.get(vocab_chapter)
         yaq3_questions = yaq3_by_chapter.get(yaq3_chapter, []) if yaq3_chapter else []
 
-        # Build concepts from vocab terms
-        concepts = []
-        for term_idx, term_entry in enumerate(terms, start=1):
-            concept_id = make_concept_id(chapter_id, term_idx)
-            concepts.append({
-                "id": concept_id,
-                "term": term_entry["word"],
-                "definition": term_entry["definition"],
-                "level3_question_ids": [],
-            })
-
-        # Link YAQ3 questions to concepts by term matching
-        # Sort concepts by term length (longest first) so specific terms
-        # like "Mechanical Solidarity" match before generic ones like "Solidarity"
-        concepts_by_length = sorted(concepts, key=lambda c: len(c["term"]), reverse=True)
-
-        chapter_questions = []
-        for q in yaq3_questions:
-            question_text = q["question"]
-            # Also check choices for term mentions
-            full_text = question_text + " " + " ".join(q["choices"])
-
-            linked_concept_id = None
-            for concept in concepts_by_length:
-                if find_term_in_text(concept["term"], full_text):
-                    if linked_concept_id is None:
-                        linked_concept_id = concept["id"]
-                    concept["level3_question_ids"].append(q["id"])
-
-            chapter_questions.append({
-                "id": q["id"],
-                "question": q["question"],
-                "choices": q["choices"],
-                "correct": q["correct"],
-                "linked_concept_id": linked_concept_id,
-            })
-
-        chapters.append({
-            "id": chapter_id,
+        # Later stages edit the chapter file in place, so only this stage's
+        # own inputs decide whether the chapter is rebuilt from scratch
+        inputs_hash = hash_json({
             "name": vocab_chapter,
-            "order": order_idx,
-            "concepts": concepts,
-            "chapter_questions": chapter_questions,
+            "terms": terms,
+            "questions": yaq3_questions,
         })
-
-    content = {"chapters": chapters}
-
-    data_dir = os.path.dirname(OUTPUT_PATH)
-    os.makedirs(data_dir, exist_ok=True)
-
-    # Write monolithic content.json (backward compat)
-    with open(OUTPUT_PATH, "w") as f:
-        json.dump(content, f, indent=2)
-
-    # Write per-chapter files and manifest
-    manifest = [{"id": ch["id"], "name": ch["name"], "order": ch["order"]} for ch in chapters]
-    with open(os.path.join(data_dir, "chapters.json"), "w") as f:
-        json.dump(manifest, f, indent=2)
-
-    for ch in chapters:
-        with open(os.path.join(data_dir, f"{ch['id']}.json"), "w") as f:
-            json.dump(ch, f, indent=2)
+        if (
+            not force
+            and build_manifest.is_clean(STAGE, chapter_id, inputs_hash)
+            and os.path.exists(chapter_path(chapter_id, data_dir))
+        ):
+            # Read back only for the summary totals
+            chapters.append(load_chapter(chapter_id, data_dir))
+            continue
+
+        chapter = build_chapter(order_idx, vocab_chapter, terms, yaq3_questions)
+        _, output_hash = write_chapter(chapter, data_dir)
+        build_manifest.record(STAGE, chapter_id, inputs_hash, output_hash)
+        chapters.append(chapter)
+        rebuilt += 1
+
+    # Manifest, then monolithic content.json (backward compat) spliced from
+    # the per-chapter files
+    write_chapter_manifest(manifest_entries, data_dir)
+    splice_content([entry["id"] for entry in manifest_entries], data_dir)
+    build_manifest.save()
 
     # Print summary
     total_terms = sum(len(ch["concepts"]) for ch in chapters)
@@ -184,7 +179,7 @@ def build_content():
         1 for ch in chapters for q in ch["chapter_questions"] if q["linked_concept_id"]
     )
     print(f"Built content.json + {len(chapters)} per-chapter files + chapters.json:")
-    print(f"  {len(chapters)} chapters")
+    print(f"  {len(chapters)} chapters ({rebuilt} rebuilt, {len(chapters) - rebuilt} unchanged)")
     print(f"  {total_terms} vocab terms")
     print(f"  {total_questions} YAQ3 questions")
     print(f"  {linked} questions linked to specific concepts")
@@ -202,4 +197,4 @@ def build_content():
 
 
 if __name__ == "__main__":
-    build_content()
+    build_content(force="--force" in sys.argv)
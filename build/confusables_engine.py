@@ -0,0 +1,192 @@
+"""Sparse confusable-concept engine.
+
+Concepts are indexed as a sparse term-document matrix: posting lists from
+each definition token (and each term word) to the concepts using it. The
+overlap counts for one concept against every other concept are one sparse
+row of A * A^T, accumulated from its own postings only, so concepts that
+share nothing are never scored. Top-k selection uses a heap rather than a
+full sort.
+
+Scores:
+    "jaccard": Jaccard similarity of definition token sets, plus 0.3 x the
+               share of term words in common (the original
+               generate_confusables score; results are identical).
+    "tfidf":   cosine similarity of TF-IDF weighted definition tokens, plus
+               the same term-word bonus.
+
+With cross_chapter=True neighbours come from the whole course instead of
+the concept's own chapter. Terms taught in more than one chapter appear as
+separate concepts there, so candidates whose normalized term or definition
+matches the concept's own are skipped; they would show up as a second
+copy of the right answer.
+"""
+
+import heapq
+import math
+import string
+
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "but", "in", "on", "at", "to", "for",
+    "of", "with", "by", "from", "is", "are", "was", "were", "be", "been",
+    "being", "have", "has", "had", "do", "does", "did", "will", "would",
+    "could", "should", "may", "might", "shall", "can", "that", "which",
+    "who", "whom", "this", "these", "those", "it", "its", "as", "if",
+    "when", "than", "because", "while", "where", "how", "not", "no",
+    "so", "up", "out", "about", "into", "over", "after", "between",
+    "through", "during", "before", "above", "below", "each", "every",
+    "both", "few", "more", "most", "other", "some", "such", "only",
+    "same", "also", "then", "just", "any", "all", "very", "often",
+    "their", "they", "them", "what",
+}
+
+TERM_BONUS_WEIGHT = 0.3
+SCORES = ("jaccard", "tfidf")
+
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def tokenize_list(text):
+    """Lowercase, remove punctuation, split into words minus stop words."""
+    return [w for w in text.lower().translate(_PUNCTUATION).split() if w not in STOP_WORDS]
+
+
+def tokenize(text):
+    """Definition word set used for Jaccard similarity."""
+    return set(tokenize_list(text))
+
+
+def normalize(text):
+    """Lowercase, punctuation-free, whitespace-collapsed text for duplicate checks."""
+    return " ".join(text.lower().translate(_PUNCTUATION).split())
+
+
+def term_words(term):
+    return set(term.lower().split())
+
+
+class ConfusableIndex:
+    """Sparse index over concepts grouped by chapter.
+
+    chapters: list of chapter dicts with "id" and "concepts" (each concept
+    having "id", "term" and "definition").
+    """
+
+    def __init__(self, chapters, score="jaccard", cross_chapter=False):
+        if score not in SCORES:
+            raise ValueError(f"unknown score {score!r}, expected one of {SCORES}")
+        self.score = score
+        self.cross_chapter = cross_chapter
+
+        self.ids = []
+        self.scopes = []  # posting-list scope per concept: chapter id, or None
+        self.def_sets = []
+        self.term_sets = []
+        for chapter in chapters:
+            scope = None if cross_chapter else chapter["id"]
+            for concept in chapter["concepts"]:
+                self.ids.append(concept["id"])
+                self.scopes.append(scope)
+                self.def_sets.append(tokenize(concept["definition"]))
+                self.term_sets.append(term_words(concept["term"]))
+
+        # Posting lists keyed by (scope, token): the non-zero entries of
+        # each column of the term-document matrix
+        self.def_postings = {}
+        self.term_postings = {}
+        for i, scope in enumerate(self.scopes):
+            for token in self.def_sets[i]:
+                self.def_postings.setdefault((scope, token), []).append(i)
+            for word in self.term_sets[i]:
+                self.term_postings.setdefault((scope, word), []).append(i)
+
+        self.positions = {cid: i for i, cid in enumerate(self.ids)}
+
+        # Same term or definition taught in another chapter: never a neighbour
+        self.duplicate_keys = None
+        if cross_chapter:
+            self.duplicate_keys = [
+                (normalize(concept["term"]), normalize(concept["definition"]))
+                for chapter in chapters for concept in chapter["concepts"]
+            ]
+
+        if score == "tfidf":
+            self._build_tfidf(chapters)
+
+    def _build_tfidf(self, chapters):
+        docs_in_scope = {}
+        for scope in self.scopes:
+            docs_in_scope[scope] = docs_in_scope.get(scope, 0) + 1
+        idf = {
+            key: math.log((1 + docs_in_scope[key[0]]) / (1 + len(postings))) + 1
+            for key, postings in self.def_postings.items()
+        }
+        self.weights = []
+        self.norms = []
+        i = 0
+        for chapter in chapters:
+            for concept in chapter["concepts"]:
+                scope = self.scopes[i]
+                counts = {}
+                for token in tokenize_list(concept["definition"]):
+                    counts[token] = counts.get(token, 0) + 1
+                weights = {t: n * idf[(scope, t)] for t, n in counts.items()}
+                self.weights.append(weights)
+                self.norms.append(math.sqrt(sum(w * w for w in weights.values())))
+                i += 1
+
+    def _scores(self, i):
+        """Sparse score row for concept i: {j: score} over concepts sharing anything."""
+        scope = self.scopes[i]
+        shared_defs = {}
+        if self.score == "jaccard":
+            for token in self.def_sets[i]:
+                for j in self.def_postings[(scope, token)]:
+                    shared_defs[j] = shared_defs.get(j, 0) + 1
+        else:
+            weights = self.weights[i]
+            for token, w in weights.items():
+                for j in self.def_postings[(scope, token)]:
+                    shared_defs[j] = shared_defs.get(j, 0.0) + w * self.weights[j][token]
+        shared_terms = {}
+        for word in self.term_sets[i]:
+            for j in self.term_postings[(scope, word)]:
+                shared_terms[j] = shared_terms.get(j, 0) + 1
+
+        size_i = len(self.def_sets[i])
+        terms_i = len(self.term_sets[i])
+        scores = {}
+        keys = self.duplicate_keys
+        for j in shared_defs.keys() | shared_terms.keys():
+            if j == i:
+                continue
+            if keys and (keys[j][0] == keys[i][0] or keys[j][1] == keys[i][1]):
+                continue
+            shared = shared_defs.get(j, 0)
+            if not shared:
+                def_sim = 0.0
+            elif self.score == "jaccard":
+                def_sim = shared / (size_i + len(self.def_sets[j]) - shared)
+            else:
+                def_sim = shared / (self.norms[i] * self.norms[j])
+            overlap = shared_terms.get(j, 0)
+            if overlap:
+                term_bonus = overlap / max(terms_i, len(self.term_sets[j])) * TERM_BONUS_WEIGHT
+            else:
+                term_bonus = 0.0
+            score = def_sim + term_bonus
+            if score > 0:
+                scores[j] = score
+        return scores
+
+    def neighbours(self, i, top_n=5):
+        """IDs of the top_n most confusable concepts for concept index i.
+
+        Ties keep concept order, matching a stable sort by descending score.
+        """
+        scores = self._scores(i)
+        best = heapq.nsmallest(top_n, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.ids[j] for j, _ in best]
+
+    def confusable_map(self, top_n=5):
+        """{concept_id: [confusable concept ids]} for every indexed concept."""
+        return {self.ids[i]: self.neighbours(i, top_n) for i in range(len(self.ids))}
@@ -0,0 +1,241 @@
+"""Indexed, lazily loaded access to the per-chapter content files.
+
+ContentStore loads a chapter only when something asks for it and keeps
+persistent indexes in build/content_index.json: question -> chapter,
+concept -> chapter, concept <-> question (from level3_question_ids) and the
+highest question ID. On open only chapter files whose size or mtime changed
+since the index was saved are re-read, so lookups and ID allocation don't
+cost a full corpus load.
+
+Edits are batched: edit() marks a chapter as touched and returns it for
+in-place changes; commit() writes only the touched chapters (atomically,
+skipping unchanged bytes), splices content.json, and updates the index.
+
+Usage:
+    store = ContentStore()
+    with store.transaction():
+        store.question(535)["question"] = "..."
+        store.add_question("ch03", {...})
+"""
+
+import json
+import os
+from contextlib import contextmanager
+
+from incremental import (
+    DATA_DIR,
+    atomic_write,
+    chapter_path,
+    load_chapter,
+    load_chapter_manifest,
+    splice_content,
+    write_chapter,
+)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(SCRIPT_DIR, "content_index.json")
+INDEX_VERSION = 1
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _index_chapter(chapter):
+    return {
+        "questions": [q["id"] for q in chapter["chapter_questions"]],
+        "concepts": {c["id"]: list(c["level3_question_ids"]) for c in chapter["concepts"]},
+    }
+
+
+class ContentStore:
+    def __init__(self, data_dir=DATA_DIR, index_path=INDEX_PATH):
+        self.data_dir = data_dir
+        self.index_path = index_path
+        self.manifest = load_chapter_manifest(data_dir)
+        self._chapters = {}  # chapter id -> loaded chapter
+        self._questions = {}  # chapter id -> {question id: question}
+        self._concepts = {}  # chapter id -> {concept id: concept}
+        self._touched = set()
+        self._load_index()
+
+    # --- Index ---
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            saved = {}
+        if saved.get("version") != INDEX_VERSION or saved.get("data_dir") != self.data_dir:
+            saved = {}
+        entries = saved.get("chapters", {})
+
+        self._entries = {}
+        stale = False
+        for ch_id in self.chapter_ids():
+            entry = entries.get(ch_id)
+            stamp = _stamp(chapter_path(ch_id, self.data_dir))
+            if entry is None or entry["stamp"] != stamp:
+                entry = dict(_index_chapter(self.chapter(ch_id)), stamp=stamp)
+                stale = True
+            self._entries[ch_id] = entry
+        self._rebuild_maps()
+        if stale or len(entries) != len(self._entries):
+            self._save_index()
+
+    def _rebuild_maps(self):
+        self._question_chapter = {}
+        self._concept_chapter = {}
+        self._concept_questions = {}
+        self._question_concepts = {}
+        for ch_id, entry in self._entries.items():
+            for qid in entry["questions"]:
+                self._question_chapter[qid] = ch_id
+            for cid, qids in entry["concepts"].items():
+                self._concept_chapter[cid] = ch_id
+                self._concept_questions[cid] = qids
+                for qid in qids:
+                    self._question_concepts.setdefault(qid, []).append(cid)
+        self._max_question_id = max(self._question_chapter, default=0)
+
+    def _save_index(self):
+        data = {"version": INDEX_VERSION, "data_dir": self.data_dir, "chapters": self._entries}
+        atomic_write(self.index_path, json.dumps(data, separators=(",", ":")).encode())
+
+    # --- Lookups ---
+
+    def chapter_ids(self):
+        return [ch_info["id"] for ch_info in self.manifest]
+
+    def chapter(self, chapter_id):
+        """Load (once) and return a chapter. Treat as read-only unless edit() was called."""
+        if chapter_id not in self._chapters:
+            chapter = load_chapter(chapter_id, self.data_dir)
+            self._chapters[chapter_id] = chapter
+            self._questions[chapter_id] = {q["id"]: q for q in chapter["chapter_questions"]}
+            self._concepts[chapter_id] = {c["id"]: c for c in chapter["concepts"]}
+        return self._chapters[chapter_id]
+
+    def chapters(self):
+        """Every chapter in manifest order (loads them all)."""
+        return [self.chapter(ch_id) for ch_id in self.chapter_ids()]
+
+    def chapter_of_question(self, question_id):
+        return self._question_chapter.get(question_id)
+
+    def chapter_of_concept(self, concept_id):
+        return self._concept_chapter.get(concept_id)
+
+    def question(self, question_id):
+        ch_id = self.chapter_of_question(question_id)
+        if ch_id is None:
+            return None
+        self.chapter(ch_id)
+        return self._questions[ch_id].get(question_id)
+
+    def concept(self, concept_id):
+        ch_id = self.chapter_of_concept(concept_id)
+        if ch_id is None:
+            return None
+        self.chapter(ch_id)
+        return self._concepts[ch_id].get(concept_id)
+
+    def questions_for_concept(self, concept_id):
+        """IDs in the concept's level3_question_ids, as of the last commit."""
+        return list(self._concept_questions.get(concept_id, []))
+
+    def concepts_for_question(self, question_id):
+        """Concepts listing the question in level3_question_ids, as of the last commit."""
+        return list(self._question_concepts.get(question_id, []))
+
+    def next_question_id(self):
+        return self._max_question_id + 1
+
+    # --- Edits ---
+
+    def edit(self, chapter_id):
+        """Return a chapter for in-place edits; it is written on commit()."""
+        self._touched.add(chapter_id)
+        return self.chapter(chapter_id)
+
+    def add_question(self, chapter_id, question):
+        """Append a question to a chapter, assigning the next free ID if it has none."""
+        chapter = self.edit(chapter_id)
+        question = dict(question)
+        if question.get("id") is None:
+            question["id"] = self.next_question_id()
+        chapter["chapter_questions"].append(question)
+        self._questions[chapter_id][question["id"]] = question
+        self._question_chapter[question["id"]] = chapter_id
+        self._max_question_id = max(self._max_question_id, question["id"])
+        return question
+
+    def drop_concepts(self, concept_ids):
+        """Remove concepts wherever they live. Returns the chapters touched."""
+        by_chapter = {}
+        for cid in concept_ids:
+            ch_id = self.chapter_of_concept(cid)
+            if ch_id is not None:
+                by_chapter.setdefault(ch_id, set()).add(cid)
+        for ch_id, cids in by_chapter.items():
+            chapter = self.edit(ch_id)
+            chapter["concepts"] = [c for c in chapter["concepts"] if c["id"] not in cids]
+            for cid in cids:
+                del self._concepts[ch_id][cid]
+                # Keep lookups consistent before commit() re-indexes
+                del self._concept_chapter[cid]
+                for qid in self._concept_questions.pop(cid, []):
+                    linked = [c for c in self._question_concepts.get(qid, []) if c != cid]
+                    if linked:
+                        self._question_concepts[qid] = linked
+                    else:
+                        self._question_concepts.pop(qid, None)
+        return set(by_chapter)
+
+    def touched(self):
+        return set(self._touched)
+
+    def commit(self):
+        """Write touched chapters, splice content.json, refresh the index.
+
+        Returns {chapter_id: output hash} for every touched chapter.
+        """
+        output_hashes = {}
+        for ch_id in self.chapter_ids():
+            if ch_id not in self._touched:
+                continue
+            chapter = self._chapters[ch_id]
+            _, output_hashes[ch_id] = write_chapter(chapter, self.data_dir)
+            self._entries[ch_id] = dict(
+                _index_chapter(chapter),
+                stamp=_stamp(chapter_path(ch_id, self.data_dir)),
+            )
+            # Re-key the lookups in case edits replaced or added items
+            self._questions[ch_id] = {q["id"]: q for q in chapter["chapter_questions"]}
+            self._concepts[ch_id] = {c["id"]: c for c in chapter["concepts"]}
+        if output_hashes:
+            splice_content(self.chapter_ids(), self.data_dir)
+            self._rebuild_maps()
+            self._save_index()
+        self._touched.clear()
+        return output_hashes
+
+    def rollback(self):
+        """Discard uncommitted edits; touched chapters reload from disk."""
+        for ch_id in self._touched:
+            for cache in (self._chapters, self._questions, self._concepts):
+                cache.pop(ch_id, None)
+        self._touched.clear()
+        self._rebuild_maps()
+
+    @contextmanager
+    def transaction(self):
+        """Commit the edits made inside the block, or roll back on error."""
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
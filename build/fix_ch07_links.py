@@ -5,13 +5,10 @@ Fixes 30 question-concept links identified by manual spot check,
 corrects Q535's factual error, and rebuilds level3_question_ids arrays.
 """
 
-import json
-import os
-import re
+from content_store import ContentStore
+from term_matcher import TermMatcher, question_text
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-CH07_PATH = os.path.join(PROJECT_ROOT, "data", "ch07.json")
+CHAPTER_ID = "ch07"
 
 # Known linked_concept_id corrections: question_id -> new concept_id
 LINK_FIXES = {
@@ -52,49 +49,27 @@ Q535_OLD_TEXT = "military service and crops"
 Q535_NEW_TEXT = "labor, rent, and a share of crops"
 
 
-def find_term_in_text(term, text):
-    """Check if a vocab term appears in text (case-insensitive, word boundary)."""
-    term_lower = term.lower().strip()
-    text_lower = text.lower().strip()
-    if len(term_lower) < 3:
-        return False
-    pattern = r'\b' + re.escape(term_lower) + r'\b'
-    if re.search(pattern, text_lower):
-        return True
-    paren_match = re.match(r'^(.+?)\s*\(([^)]+)\)\s*$', term_lower)
-    if paren_match:
-        base = paren_match.group(1).strip()
-        abbrev = paren_match.group(2).strip()
-        if len(base) >= 3 and re.search(r'\b' + re.escape(base) + r'\b', text_lower):
-            return True
-        if len(abbrev) >= 2 and re.search(r'\b' + re.escape(abbrev) + r'\b', text_lower):
-            return True
-    if '/' in term_lower:
-        for part in term_lower.split('/'):
-            part = part.strip()
-            if len(part) >= 3 and re.search(r'\b' + re.escape(part) + r'\b', text_lower):
-                return True
-    return False
-
-
 def main():
-    with open(CH07_PATH) as f:
-        chapter = json.load(f)
+    store = ContentStore()
+    chapter = store.edit(CHAPTER_ID)
+
+    def question(qid):
+        return store.question(qid) if store.chapter_of_question(qid) == CHAPTER_ID else None
 
-    concepts_by_id = {c["id"]: c for c in chapter["concepts"]}
-    questions_by_id = {q["id"]: q for q in chapter["chapter_questions"]}
+    def term(cid):
+        return store.concept(cid)["term"] if cid and store.chapter_of_concept(cid) == CHAPTER_ID else "none"
 
     # Apply linked_concept_id fixes
     fixed_count = 0
     for qid, new_link in LINK_FIXES.items():
-        q = questions_by_id.get(qid)
+        q = question(qid)
         if q is None:
             print(f"  WARNING: Question {qid} not found in ch07")
             continue
         old_link = q["linked_concept_id"]
         if old_link != new_link:
-            old_term = concepts_by_id[old_link]["term"] if old_link and old_link in concepts_by_id else "none"
-            new_term = concepts_by_id[new_link]["term"]
+            old_term = term(old_link)
+            new_term = term(new_link)
             print(f"  Q{qid}: {old_link} ({old_term}) -> {new_link} ({new_term})")
             q["linked_concept_id"] = new_link
             fixed_count += 1
@@ -102,7 +77,7 @@ def main():
             print(f"  Q{qid}: already correct ({new_link})")
 
     # Fix Q535 text
-    q535 = questions_by_id.get(535)
+    q535 = question(535)
     if q535 and Q535_OLD_TEXT in q535["question"]:
         q535["question"] = q535["question"].replace(Q535_OLD_TEXT, Q535_NEW_TEXT)
         print(f"\n  Fixed Q535 text: '{Q535_OLD_TEXT}' -> '{Q535_NEW_TEXT}'")
@@ -114,17 +89,15 @@ def main():
     for concept in chapter["concepts"]:
         concept["level3_question_ids"] = []
 
+    matcher = TermMatcher(chapter["concepts"])
     for q in chapter["chapter_questions"]:
-        full_text = q["question"] + " " + " ".join(q["choices"])
-        for concept in chapter["concepts"]:
-            if find_term_in_text(concept["term"], full_text):
-                concept["level3_question_ids"].append(q["id"])
+        for cid in matcher.match(question_text(q)):
+            store.concept(cid)["level3_question_ids"].append(q["id"])
 
-    # Write back
-    with open(CH07_PATH, "w") as f:
-        json.dump(chapter, f, indent=2)
+    # Write back ch07.json and splice it into content.json
+    store.commit()
 
-    print(f"\nApplied {fixed_count} link fixes to {CH07_PATH}")
+    print(f"\nApplied {fixed_count} link fixes to {CHAPTER_ID}")
 
     # Summary
     linked = sum(1 for q in chapter["chapter_questions"] if q["linked_concept_id"])
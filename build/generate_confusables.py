@@ -4,121 +4,104 @@
 For each concept, computes Jaccard similarity of definition words against
 all other concepts in the same chapter. Also boosts similarity for terms
 that share words. Stores top 5 confusable concept IDs on each concept
-in content.json.
-"""
+in the per-chapter files and content.json.
 
-import json
-import os
-import re
-import string
-
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-CONTENT_PATH = os.path.join(PROJECT_ROOT, "data/content.json")
-
-STOP_WORDS = {
-    "a", "an", "the", "and", "or", "but", "in", "on", "at", "to", "for",
-    "of", "with", "by", "from", "is", "are", "was", "were", "be", "been",
-    "being", "have", "has", "had", "do", "does", "did", "will", "would",
-    "could", "should", "may", "might", "shall", "can", "that", "which",
-    "who", "whom", "this", "these", "those", "it", "its", "as", "if",
-    "when", "than", "because", "while", "where", "how", "not", "no",
-    "so", "up", "out", "about", "into", "over", "after", "between",
-    "through", "during", "before", "above", "below", "each", "every",
-    "both", "few", "more", "most", "other", "some", "such", "only",
-    "same", "also", "then", "just", "any", "all", "very", "often",
-    "their", "they", "them", "what",
-}
-
-
-def tokenize(text):
-    """Lowercase, remove punctuation, split into word set minus stop words."""
-    text = text.lower()
-    text = text.translate(str.maketrans("", "", string.punctuation))
-    words = set(text.split()) - STOP_WORDS
-    return words
-
-
-def jaccard(set_a, set_b):
-    """Jaccard similarity between two sets."""
-    if not set_a and not set_b:
-        return 0.0
-    intersection = set_a & set_b
-    union = set_a | set_b
-    return len(intersection) / len(union) if union else 0.0
-
-
-def term_word_overlap(term_a, term_b):
-    """Bonus for terms sharing words (e.g., 'Primary Deviance' / 'Secondary Deviance')."""
-    words_a = set(term_a.lower().split())
-    words_b = set(term_b.lower().split())
-    shared = words_a & words_b
-    if not shared:
-        return 0.0
-    # Bonus proportional to overlap
-    return len(shared) / max(len(words_a), len(words_b))
-
-
-def compute_confusables(concepts, top_n=5):
-    """For each concept, find the top_n most confusable other concepts."""
-    # Pre-tokenize definitions
-    def_tokens = {c["id"]: tokenize(c["definition"]) for c in concepts}
+Chapters untouched since the last run are skipped; pass --force to
+recompute every chapter.
+
+Options:
+    --cross-chapter  draw confusables from the whole course
+    --tfidf          score definitions by TF-IDF cosine instead of Jaccard
+"""
 
-    confusable_map = {}
-    for concept in concepts:
-        scores = []
-        for other in concepts:
-            if other["id"] == concept["id"]:
-                continue
-            def_sim = jaccard(def_tokens[concept["id"]], def_tokens[other["id"]])
-            term_bonus = term_word_overlap(concept["term"], other["term"]) * 0.3
-            score = def_sim + term_bonus
-            scores.append((other["id"], score))
+import sys
 
-        scores.sort(key=lambda x: x[1], reverse=True)
-        confusable_map[concept["id"]] = [cid for cid, s in scores[:top_n] if s > 0]
+from confusables_engine import ConfusableIndex
+from incremental import (
+    BuildManifest,
+    chapter_path,
+    hash_file,
+    hash_json,
+    load_chapter,
+    load_chapter_manifest,
+    splice_content,
+    write_chapter,
+)
 
-    return confusable_map
+STAGE = "generate_confusables"
+TOP_N = 5
 
 
-def main():
-    with open(CONTENT_PATH) as f:
-        content = json.load(f)
+def compute_confusables(concepts, top_n=TOP_N, score="jaccard"):
+    """For each concept, find the top_n most confusable other concepts."""
+    index = ConfusableIndex([{"id": None, "concepts": concepts}], score=score)
+    return index.confusable_map(top_n)
+
+
+def main(force=False, cross_chapter=False, score="jaccard"):
+    manifest = load_chapter_manifest()
+    build_manifest = BuildManifest()
+    settings = {"top_n": TOP_N, "score": score, "cross_chapter": cross_chapter}
+
+    ch_ids = [ch_info["id"] for ch_info in manifest]
+    current_hashes = {ch_id: hash_file(chapter_path(ch_id)) for ch_id in ch_ids}
+
+    if cross_chapter:
+        # Every chapter's neighbours depend on the whole course's concepts
+        all_chapters = [load_chapter(ch_id) for ch_id in ch_ids]
+        inputs_hash = hash_json({
+            **settings,
+            "concepts": [
+                [c["id"], c["term"], c["definition"]]
+                for ch in all_chapters for c in ch["concepts"]
+            ],
+        })
+        chapters = [
+            ch for ch in all_chapters
+            if force or not build_manifest.is_clean(STAGE, ch["id"], inputs_hash, current_hashes[ch["id"]])
+        ]
+        index = ConfusableIndex(all_chapters, score=score, cross_chapter=True) if chapters else None
+    else:
+        # Confusables depend only on the chapter's own concepts, so a chapter
+        # file untouched since this stage last wrote it needs no work
+        inputs_hash = hash_json(settings)
+        chapters = [
+            load_chapter(ch_id) for ch_id in ch_ids
+            if force or not build_manifest.is_clean(STAGE, ch_id, inputs_hash, current_hashes[ch_id])
+        ]
+    unchanged = len(ch_ids) - len(chapters)
 
     total_added = 0
-    for chapter in content["chapters"]:
-        concepts = chapter["concepts"]
-        if len(concepts) < 2:
-            for c in concepts:
-                c["confusable_ids"] = []
-            continue
-
-        confusable_map = compute_confusables(concepts)
-        for concept in concepts:
+    for chapter in chapters:
+        if cross_chapter:
+            confusable_map = {
+                c["id"]: index.neighbours(index.positions[c["id"]], TOP_N)
+                for c in chapter["concepts"]
+            }
+        else:
+            confusable_map = ConfusableIndex([chapter], score=score).confusable_map(TOP_N)
+        for concept in chapter["concepts"]:
             concept["confusable_ids"] = confusable_map.get(concept["id"], [])
             total_added += len(concept["confusable_ids"])
 
-    with open(CONTENT_PATH, "w") as f:
-        json.dump(content, f, indent=2)
+        _, output_hash = write_chapter(chapter)
+        build_manifest.record(STAGE, chapter["id"], inputs_hash, output_hash)
 
-    # Update per-chapter files
-    data_dir = os.path.dirname(CONTENT_PATH)
-    for chapter in content["chapters"]:
-        ch_path = os.path.join(data_dir, f"{chapter['id']}.json")
-        with open(ch_path, "w") as f:
-            json.dump(chapter, f, indent=2)
+    splice_content(ch_ids)
+    build_manifest.save()
 
     # Summary
-    total_concepts = sum(len(ch["concepts"]) for ch in content["chapters"])
+    total_concepts = sum(len(ch["concepts"]) for ch in chapters)
     with_confusables = sum(
-        1 for ch in content["chapters"]
+        1 for ch in chapters
         for c in ch["concepts"]
         if c.get("confusable_ids")
     )
-    print(f"Generated confusables for {total_concepts} concepts:")
+    print(f"Generated confusables for {total_concepts} concepts "
+          f"({len(chapters)} chapters updated, {unchanged} unchanged):")
     print(f"  {with_confusables} concepts have confusable terms")
     print(f"  {total_added} total confusable links")
-    for ch in content["chapters"]:
+    for ch in chapters:
         avg = (
             sum(len(c["confusable_ids"]) for c in ch["concepts"]) / len(ch["concepts"])
             if ch["concepts"]
@@ -128,4 +111,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(
+        force="--force" in sys.argv,
+        cross_chapter="--cross-chapter" in sys.argv,
+        score="tfidf" if "--tfidf" in sys.argv else "jaccard",
+    )
@@ -8,45 +8,44 @@
 Uses Claude Sonnet API to create multiple-choice questions based on textbook content.
 Outputs questions in the existing md-questions format for the existing pipeline.
 
+Rather than the whole textbook chapter, each prompt carries only the passages
+that the local BM25 index (textbook_index.py) ranks highest for the missing
+concepts' terms and definitions. With --per-concept every concept gets its
+own small request instead of one request per chapter.
+
+Responses are streamed: each question is appended to the chapter's md file
+as soon as its four choices are complete, and a .progress.json sidecar
+tracks per-concept counts so an interrupted run resumes with the concepts
+still missing questions. Requests for all chapters run concurrently.
+
 Usage:
-    ANTHROPIC_API_KEY=sk-... uv run build/generate_questions.py
+    ANTHROPIC_API_KEY=sk-... uv run build/generate_questions.py [--per-concept]
 """
 
 import json
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-import anthropic
+from incremental import atomic_write
+from llm_runner import TokenBucket
+from term_matcher import find_term_in_text
+from textbook_index import (PASSAGES_PER_CONCEPT, TEXTBOOK_DIR, TEXTBOOK_MAP,
+                            format_passages, load_index)
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 
 CONTENT_PATH = os.path.join(PROJECT_ROOT, "data/content.json")
 MD_QUESTIONS_DIR = os.path.join(PROJECT_ROOT, "Old-games/yaq3/md-questions")
-TEXTBOOK_DIR = "/Users/nealcaren/Dropbox/soci101-2026s/rw"
-
-# Maps vocab chapter names to textbook filenames
-TEXTBOOK_MAP = {
-    "Sociological Perspective": "01-sociology-and-the-real-world.md",
-    "Research Methods": "02-studying-social-life:-sociological-research-methods.md",
-    "Culture": "03-culture.md",
-    "Socialization": "04-socialization,-interaction,-and-the-self.md",
-    "Groups": "05-separate-and-together-life-in-groups.md",
-    "Deviance": "06-deviance.md",
-    "Social Stratification": "07-social-class:-the-structure-of-inequality.md",
-    "Race and Ethnicity": "08-race-and-ethnicity-as-lived-experience.md",
-    "Gender": "09-constructing-gender-and-sexuality.md",
-    "Religion": "10-social-institutions:-politics,-education,-and-religion.md",
-    "Social Institutions": "10-social-institutions:-politics,-education,-and-religion.md",
-    "Economy and Work": "11-the-economy-and-work.md",
-    "Family": "12-life-at-home:-families-and-relationships.md",
-    "Media": "13-leisure-and-media.md",
-    "Health": "14-health-and-illness.md",
-    "Population": "15-populations,-cities,-and-the-environment.md",
-}
 
+MODEL = "claude-sonnet-4-20250514"
+QUESTIONS_PER_CONCEPT = 3
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 1.0
 # Maps chapter names to quiz title names (matching existing md-questions conventions)
 QUIZ_TITLE_MAP = {
     "Sociological Perspective": "01 Perspectives",
@@ -104,18 +103,27 @@ def find_missing_concepts(content):
     return missing_by_chapter
 
 
-def load_textbook_chapter(chapter_name):
-    """Load the textbook markdown for a given chapter."""
+def load_textbook_passages(index, chapter_name, concepts):
+    """Textbook passages relevant to the given concepts, as reference text.
+
+    Falls back to the chapter's opening passages when no passage shares a
+    word with any of the concepts.
+    """
     filename = TEXTBOOK_MAP.get(chapter_name)
     if not filename:
         print(f"  WARNING: No textbook mapping for '{chapter_name}'")
         return None
-    filepath = os.path.join(TEXTBOOK_DIR, filename)
-    if not os.path.exists(filepath):
-        print(f"  WARNING: Textbook file not found: {filepath}")
+    if filename not in index.files:
+        print(f"  WARNING: Textbook file not found: {os.path.join(TEXTBOOK_DIR, filename)}")
+        return None
+    passages = index.retrieve(filename, concepts)
+    if not passages:
+        terms = ", ".join(c["term"] for c in concepts)
+        print(f"  WARNING: No matching passages for {terms}; using the chapter opening")
+        passages = index.leading(filename, PASSAGES_PER_CONCEPT * len(concepts))
+    if not passages:
         return None
-    with open(filepath, "r") as f:
-        return f.read()
+    return format_passages(passages)
 
 
 def build_prompt(concepts, textbook_text, chapter_name):
@@ -161,103 +169,243 @@ Number questions sequentially starting from 1.
 Concepts needing questions (from chapter: {chapter_name}):
 {concept_list}
 
-Use the following textbook content as reference material:
+Use the following textbook excerpts as reference material:
 {textbook_text}"""
 
 
-def parse_generated_questions(response_text):
-    """Parse Claude's response into structured questions."""
-    questions = []
-    # Split on question numbers at start of line
-    raw_questions = re.split(r'\n(?=\d+\.\s)', response_text)
-
-    for raw in raw_questions:
-        raw = raw.strip()
-        if not raw:
-            continue
-
-        lines = raw.split('\n')
-        # First line is the question
-        question_match = re.match(r'^\d+\.\s+(.+)', lines[0])
-        if not question_match:
-            continue
-        question_text = question_match.group(1).strip()
-
-        choices = []
-        correct_index = None
-
-        for line in lines[1:]:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('**Explanation:**'):
-                break
-
-            # Check for correct answer (starts with *)
-            if line.startswith('*'):
-                correct_match = re.match(r'^\*([a-d])\)\s+(.+)', line)
-                if correct_match:
-                    letter = correct_match.group(1)
-                    correct_index = ord(letter) - ord('a')
-                    choices.append(correct_match.group(2).strip())
-                    continue
-
-            # Regular choice
-            choice_match = re.match(r'^([a-d])\)\s+(.+)', line)
-            if choice_match:
-                choices.append(choice_match.group(2).strip())
-
-        if question_text and len(choices) == 4 and correct_index is not None:
-            questions.append({
-                "question": question_text,
-                "choices": choices,
-                "correct": correct_index,
-            })
+QUESTION_RE = re.compile(r'^\d+\.\s+(.+)')
+CORRECT_RE = re.compile(r'^\*([a-d])\)\s+(.+)')
+CHOICE_RE = re.compile(r'^([a-d])\)\s+(.+)')
+
+
+class QuestionStreamParser:
+    """Incremental parser for Claude's question-format responses.
+
+    feed() takes the response in arbitrary chunks and returns the questions
+    completed so far; close() flushes whatever is left. A question needs
+    exactly four choice lines, one of them marked correct.
+
+    With eager=True (streaming) a question is returned as soon as its fourth
+    choice line ends, without waiting for the explanation or the rest of the
+    response; choice lines after that can only be reported. With
+    eager=False a question is returned once it ends, and one with extra
+    choice lines is skipped.
+    """
+
+    def __init__(self, eager=True):
+        self.eager = eager
+        self._buffer = ""
+        self._current = None
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')
+        questions = []
+        for line in lines:
+            questions.extend(self._line(line))
+        return questions
+
+    def close(self):
+        questions = self._line(self._buffer)
+        self._buffer = ""
+        return questions + self._finish()
+
+    @staticmethod
+    def _complete(current):
+        return len(current["choices"]) == 4 and current["correct"] is not None
+
+    @staticmethod
+    def _question(current):
+        return {
+            "question": current["question"],
+            "choices": current["choices"][:4],
+            "correct": current["correct"],
+        }
+
+    def _finish(self):
+        current = self._current
+        self._current = None
+        if current is None or current["done"]:
+            return []
+        if not self.eager and self._complete(current):
+            return [self._question(current)]
+        print(f"    SKIP: Could not parse question: {current['question'][:60]}... "
+              f"(choices={len(current['choices'])}, correct={current['correct']})")
+        return []
+
+    def _line(self, line):
+        question_match = QUESTION_RE.match(line.strip())
+        if question_match:
+            questions = self._finish()
+            self._current = {
+                "question": question_match.group(1).strip(),
+                "choices": [],
+                "correct": None,
+                "explained": False,
+                "done": False,
+            }
+            return questions
+
+        current = self._current
+        line = line.strip()
+        if current is None or current["explained"] or not line:
+            return []
+        if line.startswith('**Explanation:**'):
+            current["explained"] = True
+            return []
+
+        # Check for correct answer (starts with *)
+        correct_match = CORRECT_RE.match(line)
+        if correct_match:
+            current["correct"] = ord(correct_match.group(1)) - ord('a')
+            current["choices"].append(correct_match.group(2).strip())
         else:
-            print(f"    SKIP: Could not parse question: {question_text[:60]}... "
-                  f"(choices={len(choices)}, correct={correct_index})")
-
-    return questions
+            choice_match = CHOICE_RE.match(line)
+            if not choice_match:
+                return []
+            current["choices"].append(choice_match.group(2).strip())
 
+        if current["done"]:
+            print(f"    WARNING: Extra choice line after saving question: {current['question'][:60]}...")
+        elif self.eager and self._complete(current):
+            current["done"] = True
+            return [self._question(current)]
+        return []
 
-def format_as_md(questions, quiz_title):
-    """Format questions in the existing md-questions format."""
-    lines = [f"Quiz title: {quiz_title}", "shuffle answers: true", ""]
 
-    for i, q in enumerate(questions, 1):
-        lines.append(f"{i}. {q['question']}")
-        for j, choice in enumerate(q["choices"]):
-            letter = chr(ord('a') + j)
-            prefix = "*" if j == q["correct"] else ""
-            lines.append(f"{prefix}{letter}) {choice}")
-        lines.append("")
-
-    return "\n".join(lines)
-
-
-def generate_for_chapter(client, chapter_name, concepts, textbook_text):
-    """Generate questions for one chapter's missing concepts via Claude API."""
-    print(f"  Generating questions for {len(concepts)} concepts...")
+def parse_generated_questions(response_text):
+    """Parse Claude's response into structured questions."""
+    parser = QuestionStreamParser(eager=False)
+    return parser.feed(response_text) + parser.close()
 
-    prompt = build_prompt(concepts, textbook_text, chapter_name)
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=8192,
+def stream_questions(client, prompt, max_tokens):
+    """Yield questions from a streamed Claude response as each one completes."""
+    parser = QuestionStreamParser()
+    with client.messages.stream(
+        model=MODEL,
+        max_tokens=max_tokens,
         messages=[{"role": "user", "content": prompt}],
-    )
+    ) as stream:
+        for chunk in stream.text_stream:
+            yield from parser.feed(chunk)
+    yield from parser.close()
 
-    response_text = response.content[0].text
-    questions = parse_generated_questions(response_text)
-    print(f"  Parsed {len(questions)} valid questions "
-          f"(expected {len(concepts) * 3})")
 
-    return questions
+def format_question(question, number):
+    """One question in the md-questions format."""
+    lines = [f"{number}. {question['question']}"]
+    for j, choice in enumerate(question["choices"]):
+        letter = chr(ord('a') + j)
+        prefix = "*" if j == question["correct"] else ""
+        lines.append(f"{prefix}{letter}) {choice}")
+    lines.append("")
+    return "\n".join(lines) + "\n"
 
 
-def main():
+def format_as_md(questions, quiz_title):
+    """Format questions in the existing md-questions format."""
+    header = f"Quiz title: {quiz_title}\nshuffle answers: true\n\n"
+    return header + "".join(format_question(q, i) for i, q in enumerate(questions, 1))
+
+
+class ChapterOutput:
+    """A chapter's md file, appended to as questions arrive.
+
+    The <file>.progress.json sidecar records how many questions each concept
+    (by term) has received so an interrupted run resumes with the concepts
+    still short of QUESTIONS_PER_CONCEPT. It exists from the start of a run
+    until the chapter is complete; an md file without one is finished.
+    """
+
+    def __init__(self, path, quiz_title):
+        self.path = path
+        self.progress_path = path + ".progress.json"
+        self.quiz_title = quiz_title
+        self.counts = {}
+        self.written = 0
+        self.first_question_at = None
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.progress_path) as f:
+                progress = json.load(f)
+            self.counts = progress["counts"]
+            self.written = progress["written"]
+        else:
+            self._save_progress()
+
+    def count(self, concept):
+        return self.counts.get(concept["term"], 0)
+
+    def needed(self, concepts):
+        return [c for c in concepts if self.count(c) < QUESTIONS_PER_CONCEPT]
+
+    def add(self, question, concept):
+        """Append a question for concept. Returns False if it already has enough."""
+        with self._lock:
+            if self.count(concept) >= QUESTIONS_PER_CONCEPT:
+                return False
+            self.written += 1
+            text = format_question(question, self.written)
+            if self.written == 1:
+                with open(self.path, "w") as f:
+                    f.write(f"Quiz title: {self.quiz_title}\nshuffle answers: true\n\n" + text)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(text)
+            self.counts[concept["term"]] = self.count(concept) + 1
+            self._save_progress()
+            if self.first_question_at is None:
+                self.first_question_at = time.perf_counter()
+            return True
+
+    def _save_progress(self):
+        data = {"counts": self.counts, "written": self.written}
+        atomic_write(self.progress_path, json.dumps(data, indent=2).encode())
+
+    def finish(self, concepts):
+        """Drop the sidecar once every concept is covered (or nothing was written)."""
+        if self.written == 0 or not self.needed(concepts):
+            if os.path.exists(self.progress_path):
+                os.remove(self.progress_path)
+
+
+def assign_concept(question, batch, position, output):
+    """Concept in batch that a generated question belongs to.
+
+    Prefer the first concept still short of questions whose term appears in
+    the question or its correct answer; otherwise assume the model kept the
+    prompt's order of QUESTIONS_PER_CONCEPT questions per concept.
+    """
+    text = question["question"] + " " + question["choices"][question["correct"]]
+    for concept in batch:
+        if output.count(concept) < QUESTIONS_PER_CONCEPT and find_term_in_text(concept["term"], text):
+            return concept
+    return batch[min(position // QUESTIONS_PER_CONCEPT, len(batch) - 1)]
+
+
+def generate_batch(client, chapter_name, batch, prompt, output, bucket=None):
+    """Stream one request and append each question to output as it completes."""
+    if bucket:
+        bucket.acquire()
+    saved = 0
+    try:
+        questions = stream_questions(client, prompt, max_tokens=min(8192, 1500 * len(batch)))
+        for position, question in enumerate(questions):
+            if output.add(question, assign_concept(question, batch, position, output)):
+                saved += 1
+    except Exception as e:
+        print(f"  {chapter_name}: FAILED after {saved} questions: {e}")
+    else:
+        print(f"  {chapter_name}: saved {saved} questions for {len(batch)} concepts "
+              f"(expected {len(batch) * QUESTIONS_PER_CONCEPT})")
+    return saved
+
+
+def main(per_concept=False, client=None, index=None, output_dir=MD_QUESTIONS_DIR,
+         concurrency=CONCURRENCY, requests_per_second=REQUESTS_PER_SECOND):
     # Check for API key
-    if not os.environ.get("ANTHROPIC_API_KEY"):
+    if client is None and not os.environ.get("ANTHROPIC_API_KEY"):
         print("ERROR: ANTHROPIC_API_KEY environment variable not set.")
         print("Usage: ANTHROPIC_API_KEY=sk-... python build/generate_questions.py")
         sys.exit(1)
@@ -276,56 +424,75 @@ def main():
         print("All concepts have Level 3 questions. Nothing to generate.")
         return
 
+    # Index (or refresh) the textbook passages used for retrieval
+    if index is None:
+        index = load_index()
+
     # Initialize API client
-    client = anthropic.Anthropic()
+    if client is None:
+        # Imported here so the parser and output helpers work without it
+        import anthropic
+        client = anthropic.Anthropic()
 
-    total_generated = 0
+    start = time.perf_counter()
     total_failed = 0
+    outputs = {}
+    jobs = []  # (chapter name, concept batch, prompt)
 
     for chapter_name, concepts in sorted(missing.items()):
-        print(f"\n{'='*60}")
-        print(f"Chapter: {chapter_name} ({len(concepts)} concepts)")
-        print(f"{'='*60}")
-
-        # Skip if output file already exists
-        output_file = os.path.join(
-            MD_QUESTIONS_DIR, OUTPUT_FILE_MAP[chapter_name]
-        )
-        if os.path.exists(output_file):
-            print(f"  SKIPPED: Output file already exists: {OUTPUT_FILE_MAP[chapter_name]}")
+        output_file = os.path.join(output_dir, OUTPUT_FILE_MAP[chapter_name])
+        if os.path.exists(output_file) and not os.path.exists(output_file + ".progress.json"):
+            print(f"{chapter_name}: SKIPPED, output file already exists: {OUTPUT_FILE_MAP[chapter_name]}")
             continue
 
-        # Load textbook
-        textbook_text = load_textbook_chapter(chapter_name)
-        if not textbook_text:
-            print("  SKIPPED: No textbook content available.")
-            total_failed += len(concepts) * 3
+        # Resume at the concepts still short of questions
+        output = ChapterOutput(output_file, QUIZ_TITLE_MAP.get(chapter_name, chapter_name))
+        needed = output.needed(concepts)
+        if not needed:
+            # Interrupted after the last question landed; just tidy up
+            print(f"{chapter_name}: all concepts already have {QUESTIONS_PER_CONCEPT} questions")
+            output.finish(concepts)
             continue
-
-        # Generate questions
-        questions = generate_for_chapter(
-            client, chapter_name, concepts, textbook_text
-        )
-
-        if not questions:
-            print("  FAILED: No valid questions generated.")
-            total_failed += len(concepts) * 3
+        batches = []
+        prompts = []
+        for batch in ([c] for c in needed) if per_concept else [needed]:
+            textbook_text = load_textbook_passages(index, chapter_name, batch)
+            if not textbook_text:
+                # Only this batch goes without; the rest of the chapter still runs
+                total_failed += len(batch) * QUESTIONS_PER_CONCEPT
+                continue
+            batches.append(batch)
+            prompts.append(build_prompt(batch, textbook_text, chapter_name))
+        if not prompts:
+            print(f"{chapter_name}: SKIPPED, no textbook content available.")
+            output.finish(concepts)
             continue
-
-        # Save to md file
-        quiz_title = QUIZ_TITLE_MAP.get(chapter_name, chapter_name)
-        md_content = format_as_md(questions, quiz_title)
-        output_file = os.path.join(
-            MD_QUESTIONS_DIR, OUTPUT_FILE_MAP[chapter_name]
-        )
-        with open(output_file, "w") as f:
-            f.write(md_content)
-        print(f"  Saved {len(questions)} questions to {output_file}")
-
-        total_generated += len(questions)
-
-        # Brief pause between API calls to be respectful of rate limits
-        time.sleep(2)
+        skipped = len(needed) - sum(len(batch) for batch in batches)
+        if skipped:
+            print(f"{chapter_name}: {skipped} concepts skipped, no textbook content available.")
+
+        outputs[chapter_name] = (output, concepts)
+        resumed = f", resuming ({len(concepts) - len(needed)} done)" if output.written else ""
+        print(f"{chapter_name}: {len(needed) - skipped} concepts in {len(prompts)} requests "
+              f"(~{sum(len(p) for p in prompts) // len(prompts):,} prompt chars each){resumed}")
+        jobs.extend((chapter_name, batch, prompt) for batch, prompt in zip(batches, prompts))
+
+    # Chapters and batches run concurrently; each question is on disk as
+    # soon as its fourth choice has streamed in
+    print(f"\nRunning {len(jobs)} requests, {concurrency} at a time...")
+    bucket = TokenBucket(requests_per_second) if requests_per_second else None
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        saved = list(pool.map(
+            lambda job: generate_batch(client, job[0], job[1], job[2], outputs[job[0]][0], bucket),
+            jobs,
+        ))
+    total_generated = sum(saved)
+
+    still_missing = 0
+    for output, concepts in outputs.values():
+        still_missing += len(output.needed(concepts))
+        output.finish(concepts)
+    first_times = [o.first_question_at for o, _ in outputs.values() if o.first_question_at]
 
     # Summary
     print(f"\n{'='*60}")
@@ -333,8 +500,14 @@ def main():
     print(f"{'='*60}")
     print(f"Total questions generated: {total_generated}")
     print(f"Expected: {total_missing * 3}")
+    if first_times:
+        print(f"First question saved after {min(first_times) - start:.1f}s, "
+              f"total {time.perf_counter() - start:.1f}s")
     if total_failed:
         print(f"Questions not generated (failures): {total_failed}")
+    if still_missing:
+        print(f"Concepts still short of {QUESTIONS_PER_CONCEPT} questions: {still_missing} "
+              f"(re-run to resume)")
     print(f"\nNext steps:")
     print(f"  1. cd Old-games/yaq3 && python create_questions.py")
     print(f"  2. cd ../.. && python build/build_content.py")
@@ -342,4 +515,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(per_concept="--per-concept" in sys.argv)
@@ -0,0 +1,199 @@
+"""Incremental build helpers for data/.
+
+Each build stage records, per chapter, a hash of its inputs and a hash of
+the chapter file it wrote in build/build_manifest.json. On the next run a
+stage only recomputes chapters whose inputs changed or whose file was
+modified by something else since, rewrites them atomically (temp file +
+rename, skipped when the bytes are identical), and splices content.json
+back together from the per-chapter files without re-serializing them.
+
+The per-chapter files are the source of truth; content.json is derived.
+Rewriting a chapter also drops its published (publish_content.py) entries
+from chapters.json, so the app falls back to the fresh file instead of a
+stale dist/ payload.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+MANIFEST_PATH = os.path.join(SCRIPT_DIR, "build_manifest.json")
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_json(obj):
+    """Stable hash of a JSON-serializable value."""
+    return hash_bytes(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode())
+
+
+def hash_file(path):
+    """Hash of a file's bytes, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return hash_bytes(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def chapter_path(chapter_id, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{chapter_id}.json")
+
+
+def chapter_bytes(chapter):
+    """Serialize a chapter exactly as the build has always written it."""
+    return json.dumps(chapter, indent=2).encode()
+
+
+def atomic_write(path, data):
+    """Write bytes via temp file + rename. Returns False if unchanged."""
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def load_chapter(chapter_id, data_dir=DATA_DIR):
+    with open(chapter_path(chapter_id, data_dir)) as f:
+        return json.load(f)
+
+
+def write_chapter(chapter, data_dir=DATA_DIR):
+    """Write one chapter file. Returns (written, output_hash)."""
+    data = chapter_bytes(chapter)
+    written = atomic_write(chapter_path(chapter["id"], data_dir), data)
+    if written:
+        unpublish([chapter["id"]], data_dir)
+    return written, hash_bytes(data)
+
+
+def load_chapter_manifest(data_dir=DATA_DIR):
+    with open(os.path.join(data_dir, "chapters.json")) as f:
+        return json.load(f)
+
+
+def write_chapter_manifest(chapters, data_dir=DATA_DIR):
+    """Write chapters.json, keeping published entries for unchanged chapters.
+
+    An entry whose id, name and order are unchanged keeps its "file"; the
+    shared "bundle" survives only if no entry changed. Dropping entries for
+    rewritten chapters is write_chapter's job (via unpublish).
+    """
+    try:
+        previous = {entry["id"]: entry for entry in load_chapter_manifest(data_dir)}
+    except FileNotFoundError:
+        previous = {}
+    manifest = [{"id": ch["id"], "name": ch["name"], "order": ch["order"]} for ch in chapters]
+    same = [
+        {k: previous.get(entry["id"], {}).get(k) for k in ("id", "name", "order")} == entry
+        for entry in manifest
+    ]
+    keep_bundle = all(same) and len(previous) == len(manifest)
+    for i, entry in enumerate(manifest):
+        if same[i]:
+            old = previous[entry["id"]]
+            for key in ("file", "bundle") if keep_bundle else ("file",):
+                if key in old:
+                    entry[key] = old[key]
+    return atomic_write(
+        os.path.join(data_dir, "chapters.json"),
+        json.dumps(manifest, indent=2).encode(),
+    )
+
+
+def unpublish(chapter_ids, data_dir=DATA_DIR):
+    """Point chapters.json back at the plain files for chapter_ids.
+
+    Drops their "file" entries, and every entry's "bundle" since the bundle
+    holds all chapters. Returns True if chapters.json changed.
+    """
+    try:
+        manifest = load_chapter_manifest(data_dir)
+    except FileNotFoundError:
+        return False
+    chapter_ids = set(chapter_ids)
+    published = [e for e in manifest if e["id"] in chapter_ids and "file" in e]
+    if not published and not any("bundle" in e for e in manifest):
+        return False
+    for entry in published:
+        del entry["file"]
+    for entry in manifest:
+        entry.pop("bundle", None)
+    return atomic_write(
+        os.path.join(data_dir, "chapters.json"),
+        json.dumps(manifest, indent=2).encode(),
+    )
+
+
+def splice_content(chapter_ids, data_dir=DATA_DIR):
+    """Reassemble content.json from the per-chapter files.
+
+    json.dump(indent=2) nests each chapter four spaces deeper inside
+    {"chapters": [...]}, so the chapter files' bytes are re-indented and
+    joined rather than parsed and serialized again.
+    """
+    blocks = []
+    for chapter_id in chapter_ids:
+        with open(chapter_path(chapter_id, data_dir), "rb") as f:
+            lines = f.read().rstrip().split(b"\n")
+        blocks.append(b"\n".join(b"    " + line for line in lines))
+    if blocks:
+        data = b'{\n  "chapters": [\n' + b",\n".join(blocks) + b"\n  ]\n}"
+    else:
+        data = json.dumps({"chapters": []}, indent=2).encode()
+    return atomic_write(os.path.join(data_dir, "content.json"), data)
+
+
+class BuildManifest:
+    """Per-stage, per-chapter record of input and output hashes."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.stages = json.load(f)
+        except FileNotFoundError:
+            self.stages = {}
+
+    def is_clean(self, stage, chapter_id, inputs_hash, output_hash=None):
+        """True if the stage already ran on these inputs.
+
+        Pass the chapter file's current hash as output_hash for stages that
+        transform an existing chapter, so edits made since (by another stage
+        or by hand) mark the chapter dirty again.
+        """
+        entry = self.stages.get(stage, {}).get(chapter_id)
+        if entry is None or entry["inputs"] != inputs_hash:
+            return False
+        return output_hash is None or entry["output"] == output_hash
+
+    def record(self, stage, chapter_id, inputs_hash, output_hash):
+        self.stages.setdefault(stage, {})[chapter_id] = {
+            "inputs": inputs_hash,
+            "output": output_hash,
+        }
+
+    def forget(self, stage, chapter_id):
+        """Drop a chapter's record so the stage treats it as dirty next run."""
+        self.stages.get(stage, {}).pop(chapter_id, None)
+
+    def save(self):
+        atomic_write(self.path, json.dumps(self.stages, indent=2, sort_keys=True).encode())
@@ -0,0 +1,256 @@
+"""Concurrent LLM batch runner with an on-disk response cache.
+
+Prompts run on a thread pool behind a token-bucket rate limit, transient
+failures (rate limits, overloads, timeouts, dropped connections) are retried
+with exponential backoff, and responses are cached in build/.llm_cache/
+keyed by a hash of model, max_tokens and prompt. Reruns and resumed runs
+only pay for prompts that changed. Callers pass a validator so truncated or
+malformed responses are not cached, and refresh=True ignores the cache.
+
+The client is anything with anthropic's messages.create(model=...,
+max_tokens=..., messages=[...]) interface; StubClient drives it offline and
+also fakes messages.stream() for streaming consumers.
+
+Usage:
+    runner = BatchRunner(anthropic.Anthropic(), model=MODEL, max_tokens=2000)
+    texts = runner.run(prompts, validate=lambda i, text: covers(batches[i], text))
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from incremental import atomic_write
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(SCRIPT_DIR, ".llm_cache")
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 1.0  # seconds before the first retry, doubled each time
+
+# Timeout, conflict, rate limit, and server errors including 529 overloaded
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_transient(error):
+    """Whether a failed call is worth retrying.
+
+    Checked by shape rather than by class so this module doesn't need
+    anthropic installed: its API errors carry status_code, and its
+    APIConnectionError/APITimeoutError carry none.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """One JSON file per response, named by the request hash."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(model, max_tokens, prompt):
+        payload = json.dumps([model, max_tokens, prompt], separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)["text"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, key, model, text):
+        atomic_write(self._path(key), json.dumps({"model": model, "text": text}).encode())
+
+
+class _StubContent:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.content = [_StubContent(text)]
+
+
+class _StubStream:
+    def __init__(self, stub, text):
+        self._stub = stub
+        self._text = text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        size = self._stub.chunk_size
+        for start in range(0, len(self._text), size):
+            if self._stub.chunk_latency:
+                time.sleep(self._stub.chunk_latency)
+            yield self._text[start:start + size]
+
+
+class _StubMessages:
+    def __init__(self, stub):
+        self._stub = stub
+
+    def _respond(self, messages):
+        with self._stub._lock:
+            self._stub.calls += 1
+        if self._stub.latency:
+            time.sleep(self._stub.latency)
+        return self._stub.respond(messages[-1]["content"])
+
+    def create(self, model, max_tokens, messages):
+        return _StubResponse(self._respond(messages))
+
+    def stream(self, model, max_tokens, messages):
+        return _StubStream(self._stub, self._respond(messages))
+
+
+class StubClient:
+    """Offline stand-in for anthropic.Anthropic.
+
+    respond(prompt) -> response text. `latency` seconds are slept per call
+    to imitate network round-trips; `calls` counts requests made. Streams
+    yield the response in `chunk_size`-character pieces, `chunk_latency`
+    seconds apart.
+    """
+
+    def __init__(self, respond, latency=0.0, chunk_size=40, chunk_latency=0.0):
+        self.respond = respond
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.messages = _StubMessages(self)
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        client,
+        model,
+        max_tokens,
+        concurrency=DEFAULT_CONCURRENCY,
+        requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        cache_dir=DEFAULT_CACHE_DIR,
+        refresh=False,
+    ):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.refresh = refresh
+        self.cache_hits = 0
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, prompt):
+        for attempt in range(self.retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                response = self.client.messages.create(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+                with self._lock:
+                    self.api_calls += 1
+                return response.content[0].text
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"\n  retrying in {delay:.1f}s after error: {e}", flush=True)
+                time.sleep(delay)
+
+    def complete(self, prompt, validate=None):
+        """Response text for one prompt, from cache when possible.
+
+        The response is cached only if validate(text) is true (or no
+        validator is given); an invalid one is returned but asked for again
+        next run. With refresh=True cached responses are ignored, not read.
+        """
+        key = ResponseCache.key(self.model, self.max_tokens, prompt) if self.cache else None
+        if key and not self.refresh:
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                return cached
+        text = self._call(prompt)
+        if key and (validate is None or validate(text)):
+            self.cache.put(key, self.model, text)
+        return text
+
+    def run(self, prompts, on_done=None, validate=None):
+        """Complete all prompts concurrently; returns texts in prompt order.
+
+        on_done(index, text) is called from worker threads as each finishes.
+        validate(index, text) decides whether a response is complete enough
+        to cache. Valid responses are cached as they arrive, so an
+        interrupted run resumes where it stopped.
+        """
+        def work(index):
+            check = (lambda text: validate(index, text)) if validate else None
+            text = self.complete(prompts[index], check)
+            if on_done:
+                on_done(index, text)
+            return text
+
+        if self.concurrency <= 1:
+            return [work(i) for i in range(len(prompts))]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(work, range(len(prompts))))
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Item and concept statistics from exported student progress.
+
+Reads an export of the Apps Script "Progress" sheet one student at a time —
+a CSV download of the sheet (its "Full JSON" column), a JSON array of those
+Full JSON objects, or JSON Lines with one per line — and accumulates, in a
+single pass with constant memory per item:
+
+    questions  p-value (share of answers correct) and discrimination (the
+               correlation between a student's score on the item and their
+               score on everything else) for every L1, L2 and L3 item
+    concepts   pooled error rate per level, the mean per-student error rate
+               the Analytics sheet reports, and the hardest level
+    pairs      for confusable_ids pairs, how often students who miss one
+               concept at L1/L2 also miss the other, and the partial
+               correlation of the two error rates controlling for each
+               student's error rate on their other L1/L2 concepts, so weak
+               students missing both hard concepts don't count as confusion
+
+The results are written into the chapter files as precomputed hints the
+quiz engine reads directly: concept "difficulty" and "confused_ids" (the
+confusables students actually mix up, most confused first), question
+"difficulty" and "discrimination". Items with fewer than --min-students
+students get no hints. Re-run after build_content.py, which rebuilds
+chapters without them.
+
+Usage:
+    python3 build/progress_analytics.py EXPORT [--min-students N]
+        [--report PATH] [--dry-run]
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+
+from content_store import ContentStore
+from incremental import DATA_DIR
+
+FULL_JSON_COLUMN = "Full JSON"
+LEVELS = (1, 2, 3)
+MIN_STUDENTS = 10
+CONFUSED_TOP = 3
+
+
+# --- Reading exports ---
+
+def iter_records(path):
+    """Yield each student's Full JSON progress object from an export."""
+    if path.endswith(".csv"):
+        csv.field_size_limit(sys.maxsize)
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                record = _parse(row.get(FULL_JSON_COLUMN))
+                if record is not None:
+                    yield record
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path) as f:
+            for line in f:
+                record = _parse(line)
+                if record is not None:
+                    yield record
+    else:
+        with open(path) as f:
+            for item in _iter_json_array(f):
+                record = _parse(item.get(FULL_JSON_COLUMN, item) if isinstance(item, dict) else item)
+                if record is not None:
+                    yield record
+
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Decodes element by element from chunked reads instead of json.load, so
+    a .json export streams like the CSV and JSON Lines ones.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    opened = False
+    while True:
+        chunk = f.read(chunk_size)
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not opened:
+                if buffer[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                opened = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break  # element continues in the next chunk
+            if end == len(buffer) and chunk:
+                break  # a number may continue in the next chunk
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+        if not chunk:
+            if opened:
+                raise ValueError("unterminated JSON array")
+            return
+
+
+def _parse(value):
+    if isinstance(value, str):
+        if not value.strip():
+            return None
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(value, dict) or not value.get("concepts"):
+        return None
+    return value
+
+
+# --- Accumulators ---
+
+class Moments:
+    """Running sums for a Pearson correlation between x and y."""
+
+    __slots__ = ("n", "sx", "sy", "sxx", "syy", "sxy")
+
+    def __init__(self):
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def add(self, x, y):
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.syy += y * y
+        self.sxy += x * y
+
+    def correlation(self):
+        if self.n < 2:
+            return None
+        cov = self.n * self.sxy - self.sx * self.sy
+        var_x = self.n * self.sxx - self.sx * self.sx
+        var_y = self.n * self.syy - self.sy * self.sy
+        if var_x <= 1e-12 or var_y <= 1e-12:
+            return None
+        return cov / math.sqrt(var_x * var_y)
+
+
+class ProgressAnalytics:
+    """Accumulates statistics over student records against the course content.
+
+    chapters: chapter dicts; their concepts' confusable_ids define the pairs
+    whose co-errors are tracked.
+    """
+
+    def __init__(self, chapters):
+        self.partners = {}
+        for chapter in chapters:
+            for concept in chapter["concepts"]:
+                for other in concept.get("confusable_ids", []):
+                    self.partners.setdefault(concept["id"], set()).add(other)
+                    self.partners.setdefault(other, set()).add(concept["id"])
+        self.students = 0
+        self.items = {}  # item key -> [students, answered, correct, Moments]
+        self.concepts = {}  # concept id -> {"students", "error_sum", "levels": {level: [attempts, correct]}}
+        # (concept a, concept b) -> Moments of (e_a, e_b), (e_a, s), (e_b, s),
+        # where s is the student's error rate on their other L1/L2 concepts
+        self.pairs = {}
+
+    def add(self, record):
+        self.students += 1
+        self._add_items(record.get("questions") or {})
+        self._add_concepts(record["concepts"])
+
+    def _add_items(self, questions):
+        scores = []
+        total_answered = total_correct = 0
+        for key, sr in questions.items():
+            answered = sr.get("timesAnswered", 0)
+            if not answered:
+                continue
+            correct = min(sr.get("timesCorrect", 0), answered)
+            scores.append((key, answered, correct))
+            total_answered += answered
+            total_correct += correct
+
+        for key, answered, correct in scores:
+            item = self.items.get(key)
+            if item is None:
+                item = self.items[key] = [0, 0, 0, Moments()]
+            item[0] += 1
+            item[1] += answered
+            item[2] += correct
+            # Corrected item-total: the student's score on everything else
+            rest_answered = total_answered - answered
+            if rest_answered:
+                item[3].add(correct / answered, (total_correct - correct) / rest_answered)
+
+    def _add_concepts(self, concepts):
+        recognition_errors = {}  # concept id -> L1+L2 error rate, for pairs
+        for cid, progress in concepts.items():
+            attempts = correct = 0
+            stats = self.concepts.get(cid)
+            for level in LEVELS:
+                lp = progress.get(f"level{level}") or {}
+                a = lp.get("attempts", 0)
+                if not a:
+                    continue
+                c = min(lp.get("correct", 0), a)
+                if stats is None:
+                    stats = self.concepts[cid] = {"students": 0, "error_sum": 0.0, "levels": {}}
+                counts = stats["levels"].setdefault(level, [0, 0])
+                counts[0] += a
+                counts[1] += c
+                attempts += a
+                correct += c
+                if level < 3:
+                    recognition_errors.setdefault(cid, [0, 0])
+                    recognition_errors[cid][0] += a
+                    recognition_errors[cid][1] += c
+            if attempts:
+                stats["students"] += 1
+                stats["error_sum"] += (attempts - correct) / attempts
+
+        total_attempts = sum(a for a, _ in recognition_errors.values())
+        total_errors = sum(a - c for a, c in recognition_errors.values())
+        for cid, (a, c) in recognition_errors.items():
+            e_a = (a - c) / a
+            for other in self.partners.get(cid, ()):
+                if other <= cid or other not in recognition_errors:
+                    continue
+                b, d = recognition_errors[other]
+                e_b = (b - d) / b
+                # The student's own error rate, excluding the pair itself
+                rest = total_attempts - a - b
+                if not rest:
+                    continue
+                s = (total_errors - (a - c) - (b - d)) / rest
+                pair = self.pairs.get((cid, other))
+                if pair is None:
+                    pair = self.pairs[(cid, other)] = (Moments(), Moments(), Moments())
+                pair[0].add(e_a, e_b)
+                pair[1].add(e_a, s)
+                pair[2].add(e_b, s)
+
+    # --- Results ---
+
+    def question_stats(self):
+        """{item key: {"students", "answered", "p_value", "discrimination"}}."""
+        result = {}
+        for key, (students, answered, correct, moments) in self.items.items():
+            result[key] = {
+                "students": students,
+                "answered": answered,
+                "p_value": correct / answered,
+                "discrimination": moments.correlation(),
+            }
+        return result
+
+    def concept_stats(self):
+        """{concept id: {"students", "error_rate", "mean_student_error", "levels", "hardest_level"}}."""
+        result = {}
+        for cid, stats in self.concepts.items():
+            attempts = sum(a for a, _ in stats["levels"].values())
+            correct = sum(c for _, c in stats["levels"].values())
+            levels = {
+                level: {"attempts": a, "error_rate": (a - c) / a}
+                for level, (a, c) in sorted(stats["levels"].items())
+            }
+            result[cid] = {
+                "students": stats["students"],
+                "error_rate": (attempts - correct) / attempts,
+                "mean_student_error": stats["error_sum"] / stats["students"],
+                "levels": levels,
+                "hardest_level": max(levels, key=lambda level: levels[level]["error_rate"]),
+            }
+        return result
+
+    def confused_pairs(self, min_students=MIN_STUDENTS):
+        """[(a, b, students, co_error, partial_r)] with partial_r > 0, most confused first.
+
+        partial_r is the correlation between the two concepts' error rates
+        with each student's overall error rate partialled out: positive when
+        students who miss one miss the other more than their general
+        accuracy predicts. Unlike raw co-error it doesn't favour pairs of
+        merely hard concepts.
+        """
+        pairs = []
+        for (a, b), (ab, a_s, b_s) in self.pairs.items():
+            if ab.n < min_students:
+                continue
+            r_ab, r_as, r_bs = ab.correlation(), a_s.correlation(), b_s.correlation()
+            if r_ab is None:
+                continue
+            if r_as is None or r_bs is None:
+                partial_r = r_ab  # overall error rate didn't vary; nothing to partial out
+            elif abs(r_as) >= 1 or abs(r_bs) >= 1:
+                continue
+            else:
+                partial_r = (r_ab - r_as * r_bs) / math.sqrt((1 - r_as ** 2) * (1 - r_bs ** 2))
+            if partial_r > 0:
+                pairs.append((a, b, ab.n, ab.sxy / ab.n, partial_r))
+        pairs.sort(key=lambda p: (-p[4], -p[3], p[0], p[1]))
+        return pairs
+
+
+# --- Writing hints ---
+
+def _set(obj, key, value):
+    """Set or (for None) remove a hint field. Returns True if it changed."""
+    if value is None:
+        return obj.pop(key, None) is not None
+    if obj.get(key) == value:
+        return False
+    obj[key] = value
+    return True
+
+
+def chapter_hints(chapter, questions, concepts, confused, min_students):
+    """{("concept"|"question", id): {field: value or None}} for one chapter."""
+    hints = {}
+    for concept in chapter["concepts"]:
+        stats = concepts.get(concept["id"])
+        ok = stats is not None and stats["students"] >= min_students
+        hints[("concept", concept["id"])] = {
+            "difficulty": round(stats["error_rate"], 3) if ok else None,
+            "confused_ids": confused.get(concept["id"]) or None,
+        }
+    for q in chapter["chapter_questions"]:
+        stats = questions.get(f"L3_{q['id']}")
+        ok = stats is not None and stats["students"] >= min_students
+        discrimination = stats["discrimination"] if ok else None
+        hints[("question", q["id"])] = {
+            "difficulty": round(1 - stats["p_value"], 3) if ok else None,
+            "discrimination": round(discrimination, 3) if discrimination is not None else None,
+        }
+    return hints
+
+
+def write_hints(store, analytics, min_students=MIN_STUDENTS):
+    """Write hints into every chapter through the store; returns chapters changed."""
+    questions = analytics.question_stats()
+    concepts = analytics.concept_stats()
+    confused = {}
+    for a, b, *_ in analytics.confused_pairs(min_students):
+        for x, y in ((a, b), (b, a)):
+            if len(confused.setdefault(x, [])) < CONFUSED_TOP:
+                confused[x].append(y)
+
+    for ch_id in store.chapter_ids():
+        chapter = store.chapter(ch_id)
+        hints = chapter_hints(chapter, questions, concepts, confused, min_students)
+        items = {("concept", c["id"]): c for c in chapter["concepts"]}
+        items.update({("question", q["id"]): q for q in chapter["chapter_questions"]})
+        # Compare first so untouched chapters are neither edited nor rewritten
+        if any(items[k].get(f) != v for k, fields in hints.items() for f, v in fields.items()):
+            store.edit(ch_id)
+            for key, fields in hints.items():
+                for field, value in fields.items():
+                    _set(items[key], field, value)
+    return sorted(store.commit())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("export", help="Progress sheet export (.csv, .json or .jsonl)")
+    parser.add_argument("--min-students", type=int, default=MIN_STUDENTS)
+    parser.add_argument("--report", help="also write the full statistics to this JSON file")
+    parser.add_argument("--dry-run", action="store_true", help="report only; leave data/ untouched")
+    args = parser.parse_args()
+
+    store = ContentStore(DATA_DIR)
+    analytics = ProgressAnalytics(store.chapters())
+    for record in iter_records(args.export):
+        analytics.add(record)
+    print(f"Read {analytics.students} students, {len(analytics.items)} items, "
+          f"{len(analytics.concepts)} concepts")
+    if not analytics.students:
+        return
+
+    questions = analytics.question_stats()
+    concepts = analytics.concept_stats()
+    pairs = analytics.confused_pairs(args.min_students)
+
+    def term(cid):
+        concept = store.concept(cid)
+        return concept["term"] if concept else cid
+
+    reliable = {cid: s for cid, s in concepts.items() if s["students"] >= args.min_students}
+    print(f"\nHardest concepts ({len(reliable)} with >= {args.min_students} students):")
+    for cid, s in sorted(reliable.items(), key=lambda item: -item[1]["error_rate"])[:10]:
+        print(f"  {cid:<10} {term(cid):<35} {s['error_rate']:>5.0%} error, "
+              f"hardest L{s['hardest_level']}, {s['students']} students")
+
+    flagged = [
+        (key, s) for key, s in questions.items()
+        if s["students"] >= args.min_students
+        and s["discrimination"] is not None and s["discrimination"] < 0
+    ]
+    print(f"\nItems with negative discrimination (check the answer key): {len(flagged)}")
+    for key, s in sorted(flagged, key=lambda item: item[1]["discrimination"])[:10]:
+        print(f"  {key:<14} p={s['p_value']:.2f} r={s['discrimination']:+.2f} ({s['students']} students)")
+
+    print(f"\nMost confused pairs:")
+    for a, b, n, co_error, partial_r in pairs[:10]:
+        print(f"  {term(a)} / {term(b)}: partial r {partial_r:+.2f}, "
+              f"co-error {co_error:.2f} ({n} students)")
+
+    if args.report:
+        report = {
+            "students": analytics.students,
+            "questions": questions,
+            "concepts": concepts,
+            "confused_pairs": [
+                {"a": a, "b": b, "students": n, "co_error": co, "partial_r": r}
+                for a, b, n, co, r in pairs
+            ],
+        }
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.report}")
+
+    if args.dry_run:
+        return
+    changed = write_hints(store, analytics, args.min_students)
+    print(f"\nUpdated hints in {len(changed)} chapters"
+          + (f": {', '.join(changed)}" if changed else ""))
+
+
+if __name__ == "__main__":
+    main()
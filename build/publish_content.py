@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Publish compact, content-addressed chapter files for deployment.
+
+Run after the build stages. For each chapter in data/chapters.json this
+writes data/dist/<chapter>.<hash>.json: minified JSON where concepts and
+questions are stored as rows under a shared field list, and strings that
+repeat within the chapter (choices, concept IDs) are interned into a string
+table. Each file gets precompressed .gz and .br siblings (.br needs the
+optional brotli package). chapters.json is updated so every entry points at
+its hashed file, which browsers can cache forever; js/content-loader.js
+expands the rows back into the usual chapter objects.
+
+Files in data/dist/ that the new build no longer references are removed.
+Re-run after any stage that changes data/: a stage that rewrites a chapter
+drops that chapter's "file" (and the shared "bundle") from chapters.json,
+so until then the app loads the plain per-chapter file instead.
+
+Usage:
+    python3 build/publish_content.py [--bundle]
+
+    --bundle  also write one combined dist/bundle.<hash>.json that the
+              loader fetches instead of the per-chapter files
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from incremental import (
+    DATA_DIR,
+    atomic_write,
+    hash_bytes,
+    load_chapter,
+    load_chapter_manifest,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = os.path.join(DATA_DIR, "dist")
+FORMAT_VERSION = 1
+
+# Fields whose string values are worth interning: question choices and
+# concept-ID references repeat heavily within a chapter
+REF_FIELDS = ("choices", "confusable_ids", "confused_ids", "linked_concept_id")
+
+HASH_LENGTH = 10
+
+
+def minify(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _ref_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for v in value:
+            if isinstance(v, str):
+                yield v
+
+
+def _encode_ref(value, index):
+    if isinstance(value, str):
+        return index.get(value, value)
+    if isinstance(value, list):
+        return [index.get(v, v) if isinstance(v, str) else v for v in value]
+    return value
+
+
+def _encode_table(items, index):
+    """Rows under a shared field list; items missing a field stay objects."""
+    fields = []
+    for item in items:
+        for key in item:
+            if key not in fields:
+                fields.append(key)
+    rows = []
+    for item in items:
+        encoded = {k: _encode_ref(v, index) if k in REF_FIELDS else v for k, v in item.items()}
+        if len(item) == len(fields):
+            rows.append([encoded[f] for f in fields])
+        else:
+            rows.append(encoded)
+    return {"f": fields, "d": rows}
+
+
+def encode_chapter(chapter):
+    """Compact payload for one chapter; see expand_chapter for the inverse."""
+    counts = Counter()
+    for item in chapter["concepts"] + chapter["chapter_questions"]:
+        for key in REF_FIELDS:
+            if key in item:
+                counts.update(_ref_strings(item[key]))
+    # Only strings used more than once pay for a table slot; most frequent
+    # get the shortest indices
+    strings = [s for s, n in counts.most_common() if n > 1]
+    index = {s: i for i, s in enumerate(strings)}
+
+    payload = {"v": FORMAT_VERSION}
+    for key, value in chapter.items():
+        if key not in ("concepts", "chapter_questions"):
+            payload[key] = value
+    payload["s"] = strings
+    payload["r"] = list(REF_FIELDS)
+    payload["c"] = _encode_table(chapter["concepts"], index)
+    payload["q"] = _encode_table(chapter["chapter_questions"], index)
+    return payload
+
+
+def _expand_table(table, strings, ref_fields):
+    def deref(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return strings[value]
+        if isinstance(value, list):
+            return [strings[v] if isinstance(v, int) else v for v in value]
+        return value
+
+    items = []
+    for row in table["d"]:
+        item = dict(zip(table["f"], row)) if isinstance(row, list) else dict(row)
+        for key in ref_fields:
+            if key in item:
+                item[key] = deref(item[key])
+        items.append(item)
+    return items
+
+
+def expand_chapter(payload):
+    """Inverse of encode_chapter (mirrors expandChapter in content-loader.js)."""
+    chapter = {k: v for k, v in payload.items() if k not in ("v", "s", "r", "c", "q")}
+    chapter["concepts"] = _expand_table(payload["c"], payload["s"], payload["r"])
+    chapter["chapter_questions"] = _expand_table(payload["q"], payload["s"], payload["r"])
+    return chapter
+
+
+def write_artifact(name, data):
+    """Write a content-hashed file plus .gz/.br siblings. Returns (filename, sizes)."""
+    filename = f"{name}.{hash_bytes(data)[:HASH_LENGTH]}.json"
+    path = os.path.join(DIST_DIR, filename)
+    atomic_write(path, data)
+    sizes = {"min": len(data)}
+
+    # mtime=0 keeps the gzip bytes reproducible
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    atomic_write(path + ".gz", gz)
+    sizes["gz"] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        atomic_write(path + ".br", br)
+        sizes["br"] = len(br)
+    return filename, sizes
+
+
+def parse_ms(data, expand=None, repeat=5):
+    """Best-of-N time to parse (and optionally expand) a payload, in ms."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        obj = json.loads(data)
+        if expand:
+            expand(obj)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def prune_dist(keep):
+    removed = 0
+    for name in os.listdir(DIST_DIR):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if base not in keep:
+            os.remove(os.path.join(DIST_DIR, name))
+            removed += 1
+    return removed
+
+
+def main(bundle=False):
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = load_chapter_manifest()
+
+    entries = []
+    payloads = []
+    keep = set()
+    totals = Counter()
+    print(f"{'chapter':<8} {'pretty':>9} {'min':>9} {'gz':>8} {'br':>8} {'parse ms':>9} {'min ms':>7}")
+    for ch_info in manifest:
+        chapter = load_chapter(ch_info["id"])
+        payload = encode_chapter(chapter)
+        if expand_chapter(payload) != chapter:
+            raise RuntimeError(f"{ch_info['id']}: compact payload does not round-trip")
+        payloads.append(payload)
+
+        data = minify(payload)
+        filename, sizes = write_artifact(ch_info["id"], data)
+        keep.add(filename)
+        entries.append({
+            "id": ch_info["id"],
+            "name": ch_info["name"],
+            "order": ch_info["order"],
+            "file": f"dist/{filename}",
+        })
+
+        with open(os.path.join(DATA_DIR, f"{ch_info['id']}.json"), "rb") as f:
+            pretty = f.read()
+        sizes["pretty"] = len(pretty)
+        totals.update(sizes)
+        br = f"{sizes['br']:>8}" if "br" in sizes else f"{'-':>8}"
+        print(
+            f"{ch_info['id']:<8} {sizes['pretty']:>9} {sizes['min']:>9} {sizes['gz']:>8} {br} "
+            f"{parse_ms(pretty):>9.2f} {parse_ms(data, expand_chapter):>7.2f}"
+        )
+
+    if bundle:
+        data = minify({"v": FORMAT_VERSION, "chapters": payloads})
+        filename, sizes = write_artifact("bundle", data)
+        keep.add(filename)
+        for entry in entries:
+            entry["bundle"] = f"dist/{filename}"
+        print(f"{'bundle':<8} {'':>9} {sizes['min']:>9} {sizes['gz']:>8} "
+              f"{sizes.get('br', '-'):>8}")
+
+    atomic_write(os.path.join(DATA_DIR, "chapters.json"), json.dumps(entries, indent=2).encode())
+    removed = prune_dist(keep)
+
+    br_total = f"{totals['br']:>8}" if brotli is not None else f"{'-':>8}"
+    print(f"{'total':<8} {totals['pretty']:>9} {totals['min']:>9} {totals['gz']:>8} {br_total}")
+    print(f"\nMinified: {totals['min'] / totals['pretty']:.0%} of pretty-printed, "
+          f"gzip: {totals['gz'] / totals['pretty']:.0%}")
+    if brotli is None:
+        print("brotli not installed; skipped .br files (pip install brotli)")
+    print(f"Wrote {len(keep)} artifacts to {DIST_DIR}, removed {removed} stale files")
+
+
+if __name__ == "__main__":
+    main(bundle="--bundle" in sys.argv)
@@ -9,17 +9,24 @@ For each question, asks Claude which concepts (plural) the question is relevant
 to — not just the primary link, but any concept a student could practice by
 answering the question. Rebuilds level3_question_ids from the results.
 
+Chapters whose concepts and questions are unchanged since the last run reuse
+their entries in question_concept_mapping.json instead of calling the API;
+pass --force to re-query every chapter. Batches for changed chapters run
+concurrently, and responses that map every question in their batch are
+cached in build/.llm_cache/; pass --refresh to ignore the cache.
+
 Usage:
-    ANTHROPIC_API_KEY=sk-... uv run build/rebuild_level3_llm.py
+    ANTHROPIC_API_KEY=sk-... uv run build/rebuild_level3_llm.py [--force] [--refresh]
 """
 
 import json
 import os
 import re
 import sys
-import time
 
-import anthropic
+from content_store import ContentStore
+from incremental import BuildManifest, atomic_write, hash_json
+from llm_runner import DEFAULT_CACHE_DIR, BatchRunner
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
@@ -27,8 +34,12 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 CONTENT_PATH = os.path.join(DATA_DIR, "content.json")
 MAPPING_PATH = os.path.join(SCRIPT_DIR, "question_concept_mapping.json")
 
+MODEL = "claude-haiku-4-5-20251001"
 BATCH_SIZE = 10
-RATE_LIMIT_DELAY = 0.5
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 2.0
+
+STAGE = "rebuild_level3_llm"
 
 
 def build_concept_list(concepts):
@@ -53,12 +64,12 @@ def build_question_list(questions):
     return "\n\n".join(lines)
 
 
-def query_batch(client, chapter_name, concepts, questions):
-    """Ask Claude which concepts each question is relevant to."""
+def build_relevance_prompt(chapter_name, concepts, questions):
+    """Prompt asking which concepts each question in a batch is relevant to."""
     concept_list = build_concept_list(concepts)
     question_list = build_question_list(questions)
 
-    prompt = f"""You are helping build a study app for introductory sociology. For each question below, determine ALL concepts from the chapter that the question is relevant to — meaning a student who answers this question is practicing or demonstrating knowledge of that concept.
+    return f"""You are helping build a study app for introductory sociology. For each question below, determine ALL concepts from the chapter that the question is relevant to — meaning a student who answers this question is practicing or demonstrating knowledge of that concept.
 
 Include a concept if:
 - The question primarily tests that concept
@@ -83,14 +94,10 @@ Example:
 Q123: ch07_t05, ch07_t12, ch07_t01
 Q124: ch07_t12"""
 
-    response = client.messages.create(
-        model="claude-haiku-4-5-20251001",
-        max_tokens=4000,
-        messages=[{"role": "user", "content": prompt}],
-    )
 
+def parse_relevance_response(text, concepts):
+    """Parse "Q<id>: <concept_id>, ..." lines into {qid: [concept_ids]}."""
     results = {}
-    text = response.content[0].text
     valid_ids = {c["id"] for c in concepts}
 
     for line in text.strip().split("\n"):
@@ -113,41 +120,113 @@ Q124: ch07_t12"""
     return results
 
 
-def main():
-    client = anthropic.Anthropic()
-
-    manifest_path = os.path.join(DATA_DIR, "chapters.json")
-    with open(manifest_path) as f:
-        manifest = json.load(f)
-
-    # Full mapping: question_id -> [concept_ids]
-    full_mapping = {}
-
-    for ch_info in manifest:
-        ch_path = os.path.join(DATA_DIR, f"{ch_info['id']}.json")
-        with open(ch_path) as f:
-            chapter = json.load(f)
-
-        concepts = chapter["concepts"]
+def llm_inputs(chapter):
+    """Everything the prompt and the linked_concept_id fallback depend on."""
+    return {
+        "name": chapter["name"],
+        "concepts": [[c["id"], c["term"], c["definition"]] for c in chapter["concepts"]],
+        "questions": [
+            [q["id"], q["question"], q["choices"], q["correct"], q.get("linked_concept_id")]
+            for q in chapter["chapter_questions"]
+        ],
+    }
+
+
+def main(force=False, client=None, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    store = ContentStore(DATA_DIR)
+    manifest = store.manifest
+    build_manifest = BuildManifest()
+
+    # Full mapping: question_id -> [concept_ids]; entries for unchanged
+    # chapters are reused instead of re-querying
+    try:
+        with open(MAPPING_PATH) as f:
+            full_mapping = json.load(f)
+    except FileNotFoundError:
+        full_mapping = {}
+
+    # Pass 1: find dirty chapters and build their batch prompts
+    chapters = store.chapters()
+    inputs_hashes = {}
+    dirty = set()
+    jobs = []  # (chapter id, question ids, prompt)
+    for ch_info, chapter in zip(manifest, chapters):
         questions = chapter["chapter_questions"]
-
         if not questions:
-            print(f"{ch_info['id']} {ch_info['name']}: no questions, skipping")
             continue
-
-        print(f"{ch_info['id']} {ch_info['name']}: mapping {len(questions)} questions...", end="", flush=True)
-
-        chapter_mapping = {}
+        inputs_hash = hash_json(llm_inputs(chapter))
+        inputs_hashes[ch_info["id"]] = inputs_hash
+        if not force and build_manifest.is_clean(STAGE, ch_info["id"], inputs_hash):
+            continue
+        dirty.add(ch_info["id"])
         for i in range(0, len(questions), BATCH_SIZE):
             batch = questions[i:i + BATCH_SIZE]
-            results = query_batch(client, ch_info["name"], concepts, batch)
-            chapter_mapping.update(results)
-            print(".", end="", flush=True)
+            jobs.append((
+                ch_info["id"],
+                {q["id"] for q in batch},
+                build_relevance_prompt(ch_info["name"], chapter["concepts"], batch),
+            ))
+
+    # Query all dirty batches concurrently; responses are cached on disk
+    mapping_by_chapter = {ch_id: {} for ch_id in dirty}
+    incomplete = set()  # chapters with a batch the response didn't fully map
+    if jobs:
+        if client is None:
+            # Imported here so the prompt builders work without it
+            import anthropic
+            client = anthropic.Anthropic()
+        runner = BatchRunner(
+            client,
+            model=MODEL,
+            max_tokens=4000,
+            concurrency=CONCURRENCY,
+            requests_per_second=REQUESTS_PER_SECOND,
+            cache_dir=cache_dir,
+            refresh=refresh,
+        )
+        chapters_by_id = {ch["id"]: ch for ch in chapters}
+        print(f"Mapping {len(dirty)} changed chapters in {len(jobs)} batches...", end="", flush=True)
+        texts = runner.run(
+            [prompt for _, _, prompt in jobs],
+            on_done=lambda i, text: print(".", end="", flush=True),
+            validate=lambda i, text: jobs[i][1] <= parse_relevance_response(
+                text, chapters_by_id[jobs[i][0]]["concepts"]).keys(),
+        )
+        print(f" {runner.api_calls} API calls, {runner.cache_hits} cached")
+        for (ch_id, qids, _), text in zip(jobs, texts):
+            results = parse_relevance_response(text, chapters_by_id[ch_id]["concepts"])
+            mapping_by_chapter[ch_id].update(results)
+            if not qids <= results.keys():
+                incomplete.add(ch_id)
+
+    # Pass 2: rebuild level3_question_ids from fresh or saved mappings
+    for ch_info, chapter in zip(manifest, chapters):
+        questions = chapter["chapter_questions"]
+
+        if not questions:
+            print(f"{ch_info['id']} {ch_info['name']}: no questions, skipping")
+            continue
 
-            if i + BATCH_SIZE < len(questions):
-                time.sleep(RATE_LIMIT_DELAY)
+        if ch_info["id"] in dirty:
+            chapter_mapping = mapping_by_chapter[ch_info["id"]]
+            note = " (incomplete, re-queried next run)" if ch_info["id"] in incomplete else ""
+            print(f"{ch_info['id']} {ch_info['name']}: mapped {len(questions)} questions{note},", end="")
+
+            # Save mapping
+            for q in questions:
+                full_mapping.pop(str(q["id"]), None)
+            for qid, cids in chapter_mapping.items():
+                full_mapping[str(qid)] = cids
+        else:
+            chapter_mapping = {
+                q["id"]: full_mapping[str(q["id"])]
+                for q in questions
+                if str(q["id"]) in full_mapping
+            }
+            print(f"{ch_info['id']} {ch_info['name']}: unchanged, reused mapping,", end="")
 
         # Rebuild level3_question_ids
+        store.edit(ch_info["id"])
         for concept in chapter["concepts"]:
             concept["level3_question_ids"] = []
 
@@ -163,43 +242,28 @@ def main():
                     concepts_by_id[cid]["level3_question_ids"].append(q["id"])
                     mapped += 1
 
-        # Save mapping
-        for qid, cids in chapter_mapping.items():
-            full_mapping[str(qid)] = cids
-
-        # Write per-chapter file
-        with open(ch_path, "w") as f:
-            json.dump(chapter, f, indent=2)
-
         zero = sum(1 for c in chapter["concepts"] if not c["level3_question_ids"])
         under3 = sum(1 for c in chapter["concepts"] if 0 < len(c["level3_question_ids"]) < 3)
         print(f" {mapped} links, {zero} at 0, {under3} under 3")
 
     # Save full mapping for reference
-    with open(MAPPING_PATH, "w") as f:
-        json.dump(full_mapping, f, indent=2)
-
-    # Rebuild content.json
-    with open(CONTENT_PATH) as f:
-        content = json.load(f)
-
-    for ch_info in manifest:
-        ch_path = os.path.join(DATA_DIR, f"{ch_info['id']}.json")
-        with open(ch_path) as f:
-            chapter = json.load(f)
-        for i, ch in enumerate(content["chapters"]):
-            if ch["id"] == ch_info["id"]:
-                content["chapters"][i] = chapter
-                break
-
-    with open(CONTENT_PATH, "w") as f:
-        json.dump(content, f, indent=2)
+    atomic_write(MAPPING_PATH, json.dumps(full_mapping, indent=2).encode())
+
+    # Write chapters (unchanged bytes are skipped) and splice content.json.
+    # A chapter with an incompletely mapped batch stays dirty so the next
+    # run asks again instead of reusing the partial mapping.
+    for ch_id, output_hash in store.commit().items():
+        if ch_id in incomplete:
+            build_manifest.forget(STAGE, ch_id)
+        else:
+            build_manifest.record(STAGE, ch_id, inputs_hashes[ch_id], output_hash)
+    build_manifest.save()
 
     # Summary
     print("\n--- Summary ---")
     zero_concepts = []
     under3_concepts = []
-    for ch in content["chapters"]:
+    for ch in chapters:
         for c in ch["concepts"]:
             n = len(c["level3_question_ids"])
             if n == 0:
@@ -217,4 +281,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(force="--force" in sys.argv, refresh="--refresh" in sys.argv)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Synthetic vocab/YAQ3 corpus for benchmarking the build pipeline.
+
+Generates chapters shaped like the real inputs: about 22 terms and 78
+questions per chapter at scale 1 (16 chapters), with the term shapes the
+matchers have to handle — multi-word terms, hyphenated terms, slash terms
+("Frontstage/Backstage") and parenthetical abbreviations ("Socioeconomic
+Status (SES)"). Questions mention their concept's term, a variant of it, or
+nothing, and distractors mention neighbouring terms, so term linking and
+confusables do realistic work. Output is deterministic for a given seed.
+
+Usage:
+    python3 build/synthetic_corpus.py [--scale N] [--seed N] [--out DIR]
+
+    Writes vocabulary.json and questions.json (the Old-games input formats)
+    to DIR, default build/synthetic/.
+"""
+
+import argparse
+import json
+import os
+import random
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUT_DIR = os.path.join(SCRIPT_DIR, "synthetic")
+
+BASE_CHAPTERS = 16
+TERMS_PER_CHAPTER = 22
+QUESTIONS_PER_CHAPTER = 78
+
+WORDS = [
+    "social", "cultural", "structural", "institutional", "symbolic", "economic",
+    "political", "collective", "primary", "secondary", "formal", "informal",
+    "status", "role", "norm", "value", "sanction", "group", "network", "class",
+    "mobility", "inequality", "power", "authority", "capital", "labor", "market",
+    "identity", "self", "interaction", "ritual", "religion", "belief", "family",
+    "kinship", "marriage", "gender", "sexuality", "race", "ethnicity", "migration",
+    "population", "fertility", "mortality", "health", "illness", "media", "leisure",
+    "deviance", "control", "crime", "stigma", "label", "strain", "conflict",
+    "function", "theory", "method", "survey", "sample", "variable", "bias",
+    "education", "state", "democracy", "bureaucracy", "organization", "urban",
+    "community", "environment", "consumption", "production", "globalization",
+    "stratification", "segregation", "assimilation", "pluralism", "socialization",
+    "agency", "structure", "solidarity", "anomie", "alienation", "ideology",
+    "hegemony", "discourse", "performance", "reference", "peer", "resocialization",
+]
+FILLER = [
+    "the", "a", "of", "in", "and", "that", "to", "which", "by", "with", "for",
+    "people", "society", "members", "pattern", "process", "behavior", "shared",
+    "over", "time", "within", "across", "rules", "expectations", "individuals",
+    "their", "how", "other", "often", "through", "system", "change", "groups",
+]
+SCENARIOS = [
+    "A researcher observes that", "In a small town,", "A student notices that",
+    "During a semester abroad,", "A manager finds that", "Survey data show that",
+    "After moving to a new city,", "A journalist reports that",
+]
+
+
+def _phrase(rng, words, n):
+    return " ".join(rng.choice(words) for _ in range(n))
+
+
+def make_term(rng, seen):
+    """One unique term in a realistic shape."""
+    while True:
+        shape = rng.random()
+        words = [w.capitalize() for w in rng.sample(WORDS, rng.choice((1, 2, 2, 3)))]
+        if shape < 0.10 and len(words) > 1:
+            abbrev = "".join(w[0] for w in words).upper()
+            term = f"{' '.join(words)} ({abbrev})"
+        elif shape < 0.16:
+            term = f"{rng.choice(WORDS).capitalize()}/{rng.choice(WORDS).capitalize()}"
+        elif shape < 0.26 and len(words) > 1:
+            term = f"{words[0]}-{' '.join(w.lower() for w in words[1:])}"
+        else:
+            term = " ".join(words)
+        if term.lower() not in seen:
+            seen.add(term.lower())
+            return term
+
+
+def mention(rng, term):
+    """How a question refers to a term: as written, lowercased, or a variant."""
+    if "(" in term and rng.random() < 0.5:
+        return term[term.index("(") + 1:term.index(")")]
+    if "/" in term and rng.random() < 0.5:
+        return rng.choice(term.split("/")).lower()
+    return term.lower() if rng.random() < 0.7 else term
+
+
+def make_chapter(rng, index, first_question_id, seen_terms):
+    name = f"Synthetic Chapter {index:03d}"
+    terms = []
+    for _ in range(rng.randint(TERMS_PER_CHAPTER - 6, TERMS_PER_CHAPTER + 6)):
+        terms.append({
+            "word": make_term(rng, seen_terms),
+            "definition": _phrase(rng, WORDS + FILLER, rng.randint(6, 16)).capitalize(),
+        })
+
+    questions = []
+    for i in range(rng.randint(QUESTIONS_PER_CHAPTER - 20, QUESTIONS_PER_CHAPTER + 20)):
+        target = rng.choice(terms)["word"]
+        subject = mention(rng, target) if rng.random() < 0.8 else _phrase(rng, WORDS, 2)
+        question = (f"{rng.choice(SCENARIOS)} {_phrase(rng, WORDS + FILLER, rng.randint(12, 30))}. "
+                    f"Which concept best explains this {subject} example?")
+        choices = []
+        for _ in range(4):
+            choice = _phrase(rng, WORDS + FILLER, rng.randint(4, 12))
+            if rng.random() < 0.3:
+                choice += " " + mention(rng, rng.choice(terms)["word"])
+            choices.append(choice.capitalize())
+        questions.append({
+            "id": first_question_id + i,
+            "chapter": name,
+            "question": question,
+            "choices": choices,
+            "correct": rng.randrange(4),
+        })
+    return {"name": name, "terms": terms, "questions": questions}
+
+
+def generate_corpus(scale=1.0, seed=0):
+    """[{"name", "terms", "questions"}] for round(16 * scale) chapters."""
+    rng = random.Random(seed)
+    seen_terms = set()
+    chapters = []
+    next_id = 1
+    for index in range(1, max(1, round(BASE_CHAPTERS * scale)) + 1):
+        chapter = make_chapter(rng, index, next_id, seen_terms)
+        next_id += len(chapter["questions"])
+        chapters.append(chapter)
+    return chapters
+
+
+def audit_mismatches(chapters, rate=0.3, seed=0):
+    """Fake audit_report.json entries relinking `rate` of each chapter's questions."""
+    rng = random.Random(seed)
+    mismatches = []
+    for chapter in chapters:
+        concept_ids = [c["id"] for c in chapter["concepts"]]
+        for q in chapter["chapter_questions"]:
+            if concept_ids and rng.random() < rate:
+                mismatches.append({
+                    "question_id": q["id"],
+                    "chapter": chapter["id"],
+                    "current_link": q["linked_concept_id"],
+                    "suggested_link": rng.choice(concept_ids),
+                })
+    return mismatches
+
+
+def write_corpus(corpus, out_dir=DEFAULT_OUT_DIR):
+    """Write vocabulary.json and questions.json in the Old-games formats."""
+    os.makedirs(out_dir, exist_ok=True)
+    vocabulary = {chapter["name"]: chapter["terms"] for chapter in corpus}
+    questions = [q for chapter in corpus for q in chapter["questions"]]
+    with open(os.path.join(out_dir, "vocabulary.json"), "w") as f:
+        json.dump(vocabulary, f, indent=2)
+    with open(os.path.join(out_dir, "questions.json"), "w") as f:
+        json.dump(questions, f, indent=2)
+    return len(vocabulary), len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiple of the 16-chapter course")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.scale, args.seed)
+    n_chapters, n_questions = write_corpus(corpus, args.out)
+    n_terms = sum(len(chapter["terms"]) for chapter in corpus)
+    print(f"Wrote {n_chapters} chapters, {n_terms} terms, {n_questions} questions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
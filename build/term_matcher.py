@@ -0,0 +1,173 @@
+"""Shared vocab-term matcher for linking questions to concepts.
+
+All term variants for a set of concepts (full term, parenthetical base and
+abbreviation, slash-separated parts) are compiled once into an Aho-Corasick
+automaton. A single scan over a question's text then reports every concept
+whose term appears with regex word-boundary semantics, so linking a chapter
+no longer costs one regex search per question x concept.
+
+Usage:
+    matcher = TermMatcher(concepts)
+    concept_ids = matcher.match(question_text)
+"""
+
+import re
+
+MIN_TERM_LENGTH = 3
+MIN_ABBREV_LENGTH = 2
+
+PAREN_RE = re.compile(r'^(.+?)\s*\(([^)]+)\)\s*$')
+
+
+def normalize_for_matching(text):
+    """Normalize text for term matching in questions."""
+    return text.lower().strip()
+
+
+def term_variants(term):
+    """Return the normalized strings that count as a mention of a vocab term.
+
+    "Socioeconomic Status (SES)" also matches "socioeconomic status" or "ses";
+    "Frontstage/Backstage" also matches either part. Terms shorter than three
+    characters never match.
+    """
+    term_lower = normalize_for_matching(term)
+    if len(term_lower) < MIN_TERM_LENGTH:
+        return []
+    variants = [term_lower]
+    paren_match = PAREN_RE.match(term_lower)
+    if paren_match:
+        base = paren_match.group(1).strip()
+        abbrev = paren_match.group(2).strip()
+        if len(base) >= MIN_TERM_LENGTH:
+            variants.append(base)
+        if len(abbrev) >= MIN_ABBREV_LENGTH:
+            variants.append(abbrev)
+    if '/' in term_lower:
+        for part in term_lower.split('/'):
+            part = part.strip()
+            if len(part) >= MIN_TERM_LENGTH:
+                variants.append(part)
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(variants))
+
+
+def find_term_in_text(term, text):
+    """Check if a vocab term appears in text (case-insensitive, word boundary).
+
+    Reference implementation for one-off checks; use TermMatcher when the
+    same terms are matched against many texts.
+    """
+    text_lower = normalize_for_matching(text)
+    for variant in term_variants(term):
+        if re.search(r'\b' + re.escape(variant) + r'\b', text_lower):
+            return True
+    return False
+
+
+def _is_word_char(ch):
+    """Mirror re's \\w for str patterns."""
+    return ch.isalnum() or ch == '_'
+
+
+class TermMatcher:
+    """Aho-Corasick automaton over every term variant of a list of concepts.
+
+    match() returns concept IDs in the order the concepts were given, so
+    callers that pass concepts longest-term-first can take the first result
+    as the primary link.
+    """
+
+    def __init__(self, concepts):
+        self.concept_ids = [c["id"] for c in concepts]
+        # Trie: goto[state] maps char -> state; out[state] lists
+        # (variant_length, concept_index) pairs ending at that state
+        self._goto = [{}]
+        self._out = [[]]
+        for index, concept in enumerate(concepts):
+            for variant in term_variants(concept["term"]):
+                self._add(variant, index)
+        self._fail = self._link()
+
+    def _add(self, variant, index):
+        state = 0
+        for ch in variant:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append((len(variant), index))
+
+    def _link(self):
+        """Compute failure links breadth-first and merge suffix outputs."""
+        fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in self._goto[f]:
+                    f = fail[f]
+                target = self._goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[fail[nxt]]
+        return fail
+
+    def match(self, text):
+        """Return IDs of all concepts mentioned in text, in concept order."""
+        text_lower = normalize_for_matching(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        n = len(text_lower)
+        found = set()
+        state = 0
+        for pos, ch in enumerate(text_lower):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = pos + 1
+            after = end < n and _is_word_char(text_lower[end])
+            for length, index in out[state]:
+                if index in found:
+                    continue
+                start = end - length
+                # \b at both ends: word-ness must change across each edge
+                if _is_word_char(text_lower[end - 1]) == after:
+                    continue
+                before = start > 0 and _is_word_char(text_lower[start - 1])
+                if _is_word_char(text_lower[start]) == before:
+                    continue
+                found.add(index)
+        return [self.concept_ids[i] for i in sorted(found)]
+
+
+def question_text(question):
+    """Text searched for term mentions: question stem plus all choices."""
+    return question["question"] + " " + " ".join(question["choices"])
+
+
+def link_questions(concepts, questions):
+    """Link questions to concepts by term matching.
+
+    Concepts are tried longest term first so specific terms like "Mechanical
+    Solidarity" win over generic ones like "Solidarity". Returns
+    (linked_concept_id per question, {concept_id: [question ids]}) with
+    question ids in question order.
+    """
+    by_length = sorted(concepts, key=lambda c: len(c["term"]), reverse=True)
+    matcher = TermMatcher(by_length)
+    links = []
+    level3_ids = {c["id"]: [] for c in concepts}
+    for q in questions:
+        matched = matcher.match(question_text(q))
+        links.append(matched[0] if matched else None)
+        for cid in matched:
+            level3_ids[cid].append(q["id"])
+    return links, level3_ids
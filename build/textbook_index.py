@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Local BM25 passage index over the textbook markdown.
+
+Each textbook chapter file is split into passages of roughly PASSAGE_WORDS
+words (paragraphs grouped under their nearest heading) and indexed as BM25
+posting lists. The index is saved to build/textbook_index.json and a file is
+re-split and re-indexed only when its bytes change, so the shared
+10-social-institutions file is indexed once for both chapters that use it.
+
+generate_questions.py uses retrieve() to send the passages most relevant to
+each missing concept instead of the whole chapter.
+
+Usage:
+    python3 build/textbook_index.py              # build/refresh the index
+    python3 build/textbook_index.py "role strain" "Socialization"
+"""
+
+import json
+import math
+import os
+import re
+import sys
+
+from confusables_engine import tokenize_list
+from incremental import atomic_write, hash_bytes
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(SCRIPT_DIR, "textbook_index.json")
+INDEX_VERSION = 1
+
+TEXTBOOK_DIR = "/Users/nealcaren/Dropbox/soci101-2026s/rw"
+
+# Maps vocab chapter names to textbook filenames
+TEXTBOOK_MAP = {
+    "Sociological Perspective": "01-sociology-and-the-real-world.md",
+    "Research Methods": "02-studying-social-life:-sociological-research-methods.md",
+    "Culture": "03-culture.md",
+    "Socialization": "04-socialization,-interaction,-and-the-self.md",
+    "Groups": "05-separate-and-together-life-in-groups.md",
+    "Deviance": "06-deviance.md",
+    "Social Stratification": "07-social-class:-the-structure-of-inequality.md",
+    "Race and Ethnicity": "08-race-and-ethnicity-as-lived-experience.md",
+    "Gender": "09-constructing-gender-and-sexuality.md",
+    "Religion": "10-social-institutions:-politics,-education,-and-religion.md",
+    "Social Institutions": "10-social-institutions:-politics,-education,-and-religion.md",
+    "Economy and Work": "11-the-economy-and-work.md",
+    "Family": "12-life-at-home:-families-and-relationships.md",
+    "Media": "13-leisure-and-media.md",
+    "Health": "14-health-and-illness.md",
+    "Population": "15-populations,-cities,-and-the-environment.md",
+}
+
+PASSAGE_WORDS = 200
+PASSAGES_PER_CONCEPT = 3
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+def split_passages(text, max_words=PASSAGE_WORDS):
+    """Split markdown into [{"heading", "text"}] passages.
+
+    Paragraphs are grouped until a passage reaches max_words; a heading
+    always starts a new passage and labels the ones under it.
+    """
+    passages = []
+    heading = ""
+    paragraphs = []
+    words = 0
+
+    def flush():
+        nonlocal paragraphs, words
+        if paragraphs:
+            passages.append({"heading": heading, "text": "\n\n".join(paragraphs)})
+        paragraphs = []
+        words = 0
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        match = HEADING_RE.match(block)
+        if match and "\n" not in block:
+            flush()
+            heading = match.group(1).strip()
+            continue
+        paragraphs.append(block)
+        words += len(block.split())
+        if words >= max_words:
+            flush()
+    flush()
+    return passages
+
+
+def index_passages(passages):
+    """BM25 statistics for one file: postings {token: [[passage, tf], ...]}."""
+    postings = {}
+    lengths = []
+    for i, passage in enumerate(passages):
+        tokens = tokenize_list(passage["heading"] + " " + passage["text"])
+        lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, n in counts.items():
+            postings.setdefault(token, []).append([i, n])
+    return {"passages": passages, "lengths": lengths, "postings": postings}
+
+
+class TextbookIndex:
+    def __init__(self, textbook_dir=TEXTBOOK_DIR, index_path=INDEX_PATH):
+        self.textbook_dir = textbook_dir
+        self.index_path = index_path
+        try:
+            with open(index_path) as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            saved = {}
+        if saved.get("version") != INDEX_VERSION or saved.get("passage_words") != PASSAGE_WORDS:
+            saved = {}
+        self.files = saved.get("files", {})
+        self._dirty = False
+
+    def refresh(self, filenames):
+        """Index any of filenames that are new or changed. Returns the ones rebuilt."""
+        rebuilt = []
+        for filename in sorted(set(filenames)):
+            path = os.path.join(self.textbook_dir, filename)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            file_hash = hash_bytes(data)
+            entry = self.files.get(filename)
+            if entry is not None and entry["hash"] == file_hash:
+                continue
+            entry = index_passages(split_passages(data.decode("utf-8")))
+            entry["hash"] = file_hash
+            self.files[filename] = entry
+            self._dirty = True
+            rebuilt.append(filename)
+        return rebuilt
+
+    def save(self):
+        if self._dirty:
+            data = {"version": INDEX_VERSION, "passage_words": PASSAGE_WORDS, "files": self.files}
+            atomic_write(self.index_path, json.dumps(data, separators=(",", ":")).encode())
+            self._dirty = False
+
+    def search(self, filename, query, k=PASSAGES_PER_CONCEPT):
+        """Indices of the top-k BM25 passages in filename for query."""
+        entry = self.files.get(filename)
+        if entry is None:
+            return []
+        lengths = entry["lengths"]
+        n = len(lengths)
+        avg_length = sum(lengths) / n if n else 0
+        scores = {}
+        for token in set(tokenize_list(query)):
+            postings = entry["postings"].get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[i] / avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [i for i, _ in best]
+
+    def retrieve(self, filename, concepts, k=PASSAGES_PER_CONCEPT):
+        """Passages relevant to any of the concepts, deduplicated, in textbook order.
+
+        Each concept is queried by its term (weighted twice) and definition.
+        """
+        hits = set()
+        for concept in concepts:
+            query = f"{concept['term']} {concept['term']} {concept['definition']}"
+            hits.update(self.search(filename, query, k))
+        passages = self.files[filename]["passages"] if filename in self.files else []
+        return [passages[i] for i in sorted(hits)]
+
+    def leading(self, filename, n):
+        """The first n passages of filename, for when retrieval finds nothing."""
+        entry = self.files.get(filename)
+        return entry["passages"][:n] if entry else []
+
+
+def format_passages(passages):
+    """Render passages as reference text for a prompt."""
+    blocks = []
+    for passage in passages:
+        if passage["heading"]:
+            blocks.append(f"## {passage['heading']}\n\n{passage['text']}")
+        else:
+            blocks.append(passage["text"])
+    return "\n\n---\n\n".join(blocks)
+
+
+def load_index(textbook_dir=TEXTBOOK_DIR, index_path=INDEX_PATH):
+    """Open the index and bring every mapped textbook file up to date."""
+    index = TextbookIndex(textbook_dir, index_path)
+    index.refresh(TEXTBOOK_MAP.values())
+    index.save()
+    return index
+
+
+def main():
+    index = TextbookIndex()
+    rebuilt = index.refresh(TEXTBOOK_MAP.values())
+    index.save()
+    missing = sorted(set(TEXTBOOK_MAP.values()) - set(index.files))
+
+    total = sum(len(entry["passages"]) for entry in index.files.values())
+    print(f"Indexed {len(index.files)} textbook files ({total} passages), "
+          f"{len(rebuilt)} rebuilt, {len(index.files) - len(rebuilt)} unchanged")
+    for filename in missing:
+        print(f"  WARNING: Textbook file not found: {os.path.join(TEXTBOOK_DIR, filename)}")
+
+    if len(sys.argv) == 3:
+        query, chapter_name = sys.argv[1], sys.argv[2]
+        filename = TEXTBOOK_MAP[chapter_name]
+        for i in index.search(filename, query, k=PASSAGES_PER_CONCEPT):
+            passage = index.files[filename]["passages"][i]
+            print(f"\n[{passage['heading']}]\n{passage['text'][:300]}...")
+
+
+if __name__ == "__main__":
+    main()
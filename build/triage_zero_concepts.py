@@ -23,36 +23,27 @@ import time
 
 import anthropic
 
+from content_store import ContentStore
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
-CONTENT_PATH = os.path.join(DATA_DIR, "content.json")
 
 DROP_IDS = {"ch01_t19", "ch04_t19", "ch10_t13", "ch11_t02"}
 
 GENERATE_IDS = ["ch03_t03", "ch05_t23", "ch08_t20", "ch14_t14", "ch14_t17", "ch14_t21"]
 
-START_ID = 1503  # next available question ID
-
+START_ID = 1503  # lowest ID to assign to new questions
 
-def find_max_id(content):
-    max_id = 0
-    for ch in content["chapters"]:
-        for q in ch["chapter_questions"]:
-            if q["id"] > max_id:
-                max_id = q["id"]
-    return max_id
 
+def drop_concepts(store):
+    """Remove concepts and their question references.
 
-def drop_concepts(content):
-    """Remove concepts and their question references."""
-    dropped = 0
-    for ch in content["chapters"]:
-        before = len(ch["concepts"])
-        ch["concepts"] = [c for c in ch["concepts"] if c["id"] not in DROP_IDS]
-        dropped += before - len(ch["concepts"])
-    print(f"Dropped {dropped} concepts: {', '.join(sorted(DROP_IDS))}")
-    return content
+    Returns the IDs of chapters that lost a concept.
+    """
+    touched = store.drop_concepts(DROP_IDS)
+    print(f"Dropped concepts {', '.join(sorted(DROP_IDS))} from {', '.join(sorted(touched)) or 'no chapters'}")
+    return touched
 
 
 def generate_questions(client, concept, chapter_name):
@@ -100,70 +91,50 @@ Example format:
 def main():
     client = anthropic.Anthropic()
 
-    with open(CONTENT_PATH) as f:
-        content = json.load(f)
-
-    # Phase 1: Drop concepts
-    content = drop_concepts(content)
-
-    # Phase 2: Generate questions
-    next_id = max(find_max_id(content), START_ID - 1) + 1
-
-    # Build lookup
-    concept_map = {}
-    for ch in content["chapters"]:
-        for c in ch["concepts"]:
-            concept_map[c["id"]] = (c, ch)
-
-    for cid in GENERATE_IDS:
-        if cid not in concept_map:
-            print(f"  WARNING: {cid} not found, skipping")
-            continue
-
-        concept, chapter = concept_map[cid]
-        print(f"  Generating for {cid} ({concept['term']}) in {chapter['name']}...", end="", flush=True)
-
-        try:
-            questions = generate_questions(client, concept, chapter["name"])
-        except Exception as e:
-            print(f" ERROR: {e}")
-            continue
-
-        new_ids = []
-        for q_data in questions:
-            q_obj = {
-                "id": next_id,
-                "question": q_data["question"],
-                "choices": q_data["choices"],
-                "correct": q_data["correct"],
-                "linked_concept_id": cid,
-            }
-            chapter["chapter_questions"].append(q_obj)
-            new_ids.append(next_id)
-            next_id += 1
-
-        concept["level3_question_ids"] = new_ids
-        print(f" IDs {new_ids}")
-        time.sleep(0.5)
-
-    # Write per-chapter files
-    manifest_path = os.path.join(DATA_DIR, "chapters.json")
-    with open(manifest_path) as f:
-        manifest = json.load(f)
-
-    chapters_by_id = {ch["id"]: ch for ch in content["chapters"]}
-    for ch_info in manifest:
-        ch = chapters_by_id.get(ch_info["id"])
-        if ch:
-            ch_path = os.path.join(DATA_DIR, f"{ch_info['id']}.json")
-            with open(ch_path, "w") as f:
-                json.dump(ch, f, indent=2)
-
-    # Write content.json
-    with open(CONTENT_PATH, "w") as f:
-        json.dump(content, f, indent=2)
-
-    print(f"\nDone. Next available ID: {next_id}")
+    # Chapters load lazily: only those holding DROP_IDS or GENERATE_IDS are
+    # read, and commit() writes just those back
+    store = ContentStore(DATA_DIR)
+
+    with store.transaction():
+        # Phase 1: Drop concepts
+        drop_concepts(store)
+
+        # Phase 2: Generate questions
+        for cid in GENERATE_IDS:
+            ch_id = store.chapter_of_concept(cid)
+            if ch_id is None:
+                print(f"  WARNING: {cid} not found, skipping")
+                continue
+
+            chapter = store.chapter(ch_id)
+            concept = store.concept(cid)
+            print(f"  Generating for {cid} ({concept['term']}) in {chapter['name']}...", end="", flush=True)
+
+            try:
+                questions = generate_questions(client, concept, chapter["name"])
+            except Exception as e:
+                print(f" ERROR: {e}")
+                continue
+
+            new_ids = []
+            for q_data in questions:
+                q_obj = store.add_question(ch_id, {
+                    "id": max(store.next_question_id(), START_ID),
+                    "question": q_data["question"],
+                    "choices": q_data["choices"],
+                    "correct": q_data["correct"],
+                    "linked_concept_id": cid,
+                })
+                new_ids.append(q_obj["id"])
+
+            concept["level3_question_ids"] = new_ids
+            print(f" IDs {new_ids}")
+            time.sleep(0.5)
+
+        touched = store.touched()
+
+    print(f"Updated: {', '.join(sorted(touched)) or 'nothing'}")
+    print(f"\nDone. Next available ID: {max(store.next_question_id(), START_ID)}")
 
 
 if __name__ == "__main__":
@@ -1,25 +1,73 @@
 /**
  * Fetches chapter data from per-chapter JSON files.
- * Public API unchanged: load(), getChapters(), getChapter(id).
+ * Manifest entries with a `file` (or shared `bundle`) point at the compact,
+ * content-hashed payloads written by build/publish_content.py; otherwise the
+ * pretty-printed data/<id>.json files are used.
+ * Public API: load(), getChapters(), getChapter(id), getConcept(id).
  */
 const ContentLoader = (() => {
     let _content = null;
+    let _conceptsById = null;
+
+    async function fetchJson(path) {
+        const resp = await fetch(`data/${path}`);
+        if (!resp.ok) throw new Error(`Failed to load ${path}`);
+        return resp.json();
+    }
+
+    /**
+     * Expand a compact payload: rows under a shared field list, with
+     * repeated strings in ref fields replaced by indexes into `s`.
+     */
+    function expandChapter(payload) {
+        const { v, s, r, c, q, ...chapter } = payload;
+        const refFields = new Set(r);
+        const deref = value => {
+            if (typeof value === 'number') return s[value];
+            if (Array.isArray(value)) return value.map(x => (typeof x === 'number' ? s[x] : x));
+            return value;
+        };
+        const expandTable = table => table.d.map(row => {
+            const item = {};
+            if (Array.isArray(row)) {
+                table.f.forEach((field, i) => { item[field] = row[i]; });
+            } else {
+                Object.assign(item, row);
+            }
+            for (const field of refFields) {
+                if (field in item) item[field] = deref(item[field]);
+            }
+            return item;
+        });
+        chapter.concepts = expandTable(c);
+        chapter.chapter_questions = expandTable(q);
+        return chapter;
+    }
 
     async function load() {
         if (_content) return _content;
-        const manifestResp = await fetch('data/chapters.json');
+        // Revalidate the manifest every time; the hashed files it names never change
+        const manifestResp = await fetch('data/chapters.json', { cache: 'no-cache' });
         if (!manifestResp.ok) throw new Error('Failed to load chapters.json');
         const manifest = await manifestResp.json();
 
-        const chapterPromises = manifest.map(entry =>
-            fetch(`data/${entry.id}.json`).then(r => {
-                if (!r.ok) throw new Error(`Failed to load ${entry.id}.json`);
-                return r.json();
-            })
-        );
-        const chapters = await Promise.all(chapterPromises);
+        let chapters;
+        if (manifest.length > 0 && manifest[0].bundle) {
+            const bundle = await fetchJson(manifest[0].bundle);
+            chapters = bundle.chapters.map(expandChapter);
+        } else {
+            chapters = await Promise.all(manifest.map(entry =>
+                entry.file
+                    ? fetchJson(entry.file).then(expandChapter)
+                    : fetchJson(`${entry.id}.json`)
+            ));
+        }
 
         _content = { chapters };
+        _conceptsById = new Map();
+        for (const ch of chapters) {
+            for (const c of ch.concepts) _conceptsById.set(c.id, c);
+        }
         return _content;
     }
 
@@ -31,5 +79,9 @@ const ContentLoader = (() => {
         return getChapters().find(ch => ch.id === chapterId);
     }
 
-    return { load, getChapters, getChapter };
+    function getConcept(conceptId) {
+        return _conceptsById ? _conceptsById.get(conceptId) : undefined;
+    }
+
+    return { load, getChapters, getChapter, getConcept };
 })();
@@ -50,27 +50,26 @@ const QuizEngine = (() => {
                 } else if (currentLevel === 2) {
                     candidates.push(makeLevel2Question(chapter, concept));
                 } else if (currentLevel === 3) {
-                    // Pick one random L3 question for this concept
-                    const qIds = concept.level3_question_ids;
-                    if (qIds.length > 0) {
-                        const randomId = qIds[Math.floor(Math.random() * qIds.length)];
-                        const qData = chapter.chapter_questions.find(cq => cq.id === randomId);
-                        if (qData) {
-                            const q = makeLevel3FromData(qData, concept, chapter);
-                            q._inProgress = inProgress;
-                            candidates.push(q);
-                        }
+                    // Pick one L3 question for this concept
+                    const qData = pickLevel3Question(chapter, concept);
+                    if (qData) {
+                        const q = makeLevel3FromData(qData, concept, chapter);
+                        q._inProgress = inProgress;
+                        candidates.push(q);
                     }
                 }
             }
         }
 
-        // Compute weakness scores for tiebreaking
+        // Compute weakness scores for tiebreaking; concepts the class as a
+        // whole finds hard (precomputed difficulty) get a small nudge
         for (const q of candidates) {
             const cp = Progress.getConceptProgress(q.conceptId);
             const totalAttempts = cp.level1.attempts + cp.level2.attempts + cp.level3.attempts;
             const totalCorrect = cp.level1.correct + cp.level2.correct + cp.level3.correct;
             q._weaknessScore = totalAttempts > 0 ? (totalAttempts - totalCorrect) / totalAttempts : 0;
+            const concept = ContentLoader.getConcept(q.conceptId);
+            q._difficulty = (concept && concept.difficulty) || 0;
         }
 
         // Sort: due SR first, then in-progress, then new — with random tiebreaker
@@ -85,9 +84,29 @@ const QuizEngine = (() => {
 
     function priorityScore(q) {
         // Lower = higher priority
-        if (q._srDue) return 0 - (q._weaknessScore || 0) * 0.1;
-        if (q._inProgress) return 1 - (q._weaknessScore || 0) * 0.1;
-        return 2;
+        const nudge = (q._difficulty || 0) * 0.05;
+        if (q._srDue) return 0 - (q._weaknessScore || 0) * 0.1 - nudge;
+        if (q._inProgress) return 1 - (q._weaknessScore || 0) * 0.1 - nudge;
+        return 2 - nudge;
+    }
+
+    /**
+     * Pick one of a concept's L3 questions at random, weighted towards
+     * questions that discriminate well (precomputed by
+     * build/progress_analytics.py); questions without stats weigh 1.
+     */
+    function pickLevel3Question(chapter, concept) {
+        const candidates = concept.level3_question_ids
+            .map(id => chapter.chapter_questions.find(cq => cq.id === id))
+            .filter(Boolean);
+        if (candidates.length === 0) return null;
+        const weights = candidates.map(q => 1 + Math.max(0, q.discrimination || 0));
+        let r = Math.random() * weights.reduce((a, b) => a + b, 0);
+        for (let i = 0; i < candidates.length; i++) {
+            r -= weights[i];
+            if (r < 0) return candidates[i];
+        }
+        return candidates[candidates.length - 1];
     }
 
     function addSRReviewQuestions(candidates, chapter, concept) {
@@ -134,12 +153,8 @@ const QuizEngine = (() => {
                     if (lvl === 1) allQuestions.push(makeLevel1Question(chapter, concept));
                     else if (lvl === 2) allQuestions.push(makeLevel2Question(chapter, concept));
                     else if (lvl === 3) {
-                        const qIds = concept.level3_question_ids;
-                        if (qIds.length > 0) {
-                            const randomId = qIds[Math.floor(Math.random() * qIds.length)];
-                            const qData = chapter.chapter_questions.find(cq => cq.id === randomId);
-                            if (qData) allQuestions.push(makeLevel3FromData(qData, concept, chapter));
-                        }
+                        const qData = pickLevel3Question(chapter, concept);
+                        if (qData) allQuestions.push(makeLevel3FromData(qData, concept, chapter));
                     }
                 }
             }
@@ -157,8 +172,10 @@ const QuizEngine = (() => {
         const distractors = pickDistractors(
             chapter.concepts.filter(c => c.id !== concept.id),
             c => c.definition,
+            correctDef,
             3,
-            concept.confusable_ids
+            concept.confusable_ids,
+            concept.confused_ids
         );
         const choices = shuffle([correctDef, ...distractors]);
         return {
@@ -184,8 +201,10 @@ const QuizEngine = (() => {
         const distractors = pickDistractors(
             chapter.concepts.filter(c => c.id !== concept.id),
             c => c.term,
+            correctTerm,
             3,
-            concept.confusable_ids
+            concept.confusable_ids,
+            concept.confused_ids
         );
         const choices = shuffle([correctTerm, ...distractors]);
         return {
@@ -222,22 +241,36 @@ const QuizEngine = (() => {
         };
     }
 
-    function pickDistractors(pool, extractor, count, preferredIds) {
+    function pickDistractors(pool, extractor, correct, count, preferredIds, confusedIds) {
         const result = [];
         const usedItems = new Set();
+        // Never offer the right answer twice (a term repeated in another
+        // chapter) or two choices differing only in case.
+        const seen = new Set([String(correct).toLowerCase()]);
+        const accept = val => {
+            const key = String(val).toLowerCase();
+            if (seen.has(key)) return false;
+            seen.add(key);
+            result.push(val);
+            return true;
+        };
+        const lookup = id => pool.find(c => c.id === id) || ContentLoader.getConcept(id);
 
-        // Prefer confusable concepts first
-        if (preferredIds && preferredIds.length > 0) {
-            const preferred = shuffle(
-                pool.filter(c => preferredIds.includes(c.id))
-            );
+        // Prefer confusable concepts first (these may come from other
+        // chapters when confusables were generated course-wide), led by the
+        // ones students actually mix up most (precomputed confused_ids).
+        // Those take at most count - 1 slots so the set still varies.
+        if ((preferredIds && preferredIds.length > 0) || (confusedIds && confusedIds.length > 0)) {
+            const confused = shuffle((confusedIds || []).map(lookup).filter(Boolean)).slice(0, count - 1);
+            const preferred = confused.concat(shuffle(
+                (preferredIds || [])
+                    .filter(id => !confused.some(c => c.id === id))
+                    .map(lookup)
+                    .filter(Boolean)
+            ));
             for (const item of preferred) {
                 if (result.length >= count) break;
-                const val = extractor(item);
-                if (!result.includes(val)) {
-                    result.push(val);
-                    usedItems.add(item.id);
-                }
+                if (accept(extractor(item))) usedItems.add(item.id);
             }
         }
 
@@ -247,8 +280,7 @@ const QuizEngine = (() => {
         );
         for (const item of remaining) {
             if (result.length >= count) break;
-            const val = extractor(item);
-            if (!result.includes(val)) result.push(val);
+            accept(extractor(item));
         }
 
         // If not enough distractors, pad with placeholders
@@ -292,12 +324,8 @@ const QuizEngine = (() => {
                 l1Pool.push(makeLevel1Question(chapter, concept));
                 l2Pool.push(makeLevel2Question(chapter, concept));
 
-                if (concept.level3_question_ids.length > 0) {
-                    const qIds = concept.level3_question_ids;
-                    const randomId = qIds[Math.floor(Math.random() * qIds.length)];
-                    const qData = chapter.chapter_questions.find(cq => cq.id === randomId);
-                    if (qData) l3Pool.push(makeLevel3FromData(qData, concept, chapter));
-                }
+                const qData = pickLevel3Question(chapter, concept);
+                if (qData) l3Pool.push(makeLevel3FromData(qData, concept, chapter));
             }
         }
 
@@ -0,0 +1,105 @@
+import glob
+import json
+import os
+import string
+
+import pytest
+
+from confusables_engine import STOP_WORDS, ConfusableIndex, normalize
+from incremental import DATA_DIR
+from synthetic_corpus import generate_corpus
+
+
+# The all-pairs Jaccard scoring generate_confusables.py used before the
+# sparse index, kept here as the reference
+def _tokenize(text):
+    text = text.lower().translate(str.maketrans("", "", string.punctuation))
+    return set(text.split()) - STOP_WORDS
+
+
+def _jaccard(set_a, set_b):
+    union = set_a | set_b
+    return len(set_a & set_b) / len(union) if union else 0.0
+
+
+def _term_word_overlap(term_a, term_b):
+    words_a = set(term_a.lower().split())
+    words_b = set(term_b.lower().split())
+    shared = words_a & words_b
+    return len(shared) / max(len(words_a), len(words_b)) if shared else 0.0
+
+
+def reference_confusables(concepts, top_n=5):
+    def_tokens = {c["id"]: _tokenize(c["definition"]) for c in concepts}
+    confusable_map = {}
+    for concept in concepts:
+        scores = []
+        for other in concepts:
+            if other["id"] == concept["id"]:
+                continue
+            score = (_jaccard(def_tokens[concept["id"]], def_tokens[other["id"]])
+                     + _term_word_overlap(concept["term"], other["term"]) * 0.3)
+            scores.append((other["id"], score))
+        scores.sort(key=lambda x: x[1], reverse=True)
+        confusable_map[concept["id"]] = [cid for cid, s in scores[:top_n] if s > 0]
+    return confusable_map
+
+
+def synthetic_chapters():
+    chapters = []
+    for n, chapter in enumerate(generate_corpus(scale=0.5, seed=2), start=1):
+        chapters.append({"id": f"ch{n:02d}", "concepts": [
+            {"id": f"ch{n:02d}_t{i:02d}", "term": t["word"], "definition": t["definition"]}
+            for i, t in enumerate(chapter["terms"], start=1)
+        ]})
+    return chapters
+
+
+def real_chapters():
+    chapters = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "ch[0-9]*.json"))):
+        with open(path) as f:
+            chapters.append(json.load(f))
+    return chapters
+
+
+@pytest.mark.parametrize("chapters", [synthetic_chapters, real_chapters])
+def test_jaccard_matches_the_all_pairs_scores(chapters):
+    chapters = chapters()
+    assert chapters
+    for chapter in chapters:
+        expected = reference_confusables(chapter["concepts"])
+        assert ConfusableIndex([chapter]).confusable_map(5) == expected, chapter["id"]
+
+
+def test_chapters_indexed_together_stay_separate():
+    chapters = synthetic_chapters()
+    combined = ConfusableIndex(chapters).confusable_map(5)
+    for chapter in chapters:
+        for cid, neighbours in ConfusableIndex([chapter]).confusable_map(5).items():
+            assert combined[cid] == neighbours
+
+
+def test_cross_chapter_skips_the_same_term_in_another_chapter():
+    chapters = [
+        {"id": "ch10", "concepts": [
+            {"id": "ch10_t01", "term": "Religion", "definition": "A system of beliefs about the sacred."},
+            {"id": "ch10_t02", "term": "Sacred", "definition": "Things set apart and treated as sacred."},
+        ]},
+        {"id": "ch11", "concepts": [
+            {"id": "ch11_t06", "term": "religion", "definition": "A system of beliefs about the sacred"},
+            {"id": "ch11_t07", "term": "Civil Religion", "definition": "Beliefs about the sacred nation."},
+        ]},
+    ]
+    confusables = ConfusableIndex(chapters, cross_chapter=True).confusable_map(5)
+    assert confusables["ch10_t01"] == ["ch11_t07", "ch10_t02"]
+    assert "ch10_t01" not in confusables["ch11_t06"]
+
+
+def test_cross_chapter_never_pairs_duplicates_in_the_course():
+    chapters = real_chapters()
+    concepts = {c["id"]: c for chapter in chapters for c in chapter["concepts"]}
+    for cid, neighbours in ConfusableIndex(chapters, cross_chapter=True).confusable_map(5).items():
+        for other in neighbours:
+            assert normalize(concepts[cid]["term"]) != normalize(concepts[other]["term"])
+            assert normalize(concepts[cid]["definition"]) != normalize(concepts[other]["definition"])
@@ -0,0 +1,147 @@
+import json
+import os
+
+import pytest
+
+from content_store import ContentStore
+from incremental import load_chapter, write_chapter, write_chapter_manifest
+
+
+def make_chapter(n, first_qid):
+    ch_id = f"ch{n:02d}"
+    qids = [first_qid, first_qid + 1]
+    return {
+        "id": ch_id,
+        "name": f"Chapter {n}",
+        "order": n,
+        "concepts": [
+            {"id": f"{ch_id}_t01", "term": "Alpha", "definition": "First", "level3_question_ids": qids},
+            {"id": f"{ch_id}_t02", "term": "Beta", "definition": "Second", "level3_question_ids": qids[:1]},
+        ],
+        "chapter_questions": [
+            {"id": qid, "question": f"Question {qid}?", "choices": ["a", "b", "c", "d"],
+             "correct": 0, "linked_concept_id": f"{ch_id}_t01"}
+            for qid in qids
+        ],
+    }
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    chapters = [make_chapter(1, 1), make_chapter(2, 10)]
+    for chapter in chapters:
+        write_chapter(chapter, str(tmp_path))
+    write_chapter_manifest(chapters, str(tmp_path))
+    return tmp_path
+
+
+def open_store(data_dir):
+    return ContentStore(str(data_dir), str(data_dir / "index.json"))
+
+
+def test_lookups(data_dir):
+    store = open_store(data_dir)
+    assert store.chapter_of_question(11) == "ch02"
+    assert store.question(11)["question"] == "Question 11?"
+    assert store.concept("ch01_t02")["term"] == "Beta"
+    assert store.questions_for_concept("ch01_t01") == [1, 2]
+    assert store.concepts_for_question(1) == ["ch01_t01", "ch01_t02"]
+    assert store.next_question_id() == 12
+    assert store.question(99) is None and store.concept("ch09_t01") is None
+
+
+def test_warm_index_loads_no_chapters(data_dir):
+    open_store(data_dir)
+    store = open_store(data_dir)
+    assert store._chapters == {}
+    assert store.chapter_of_concept("ch02_t01") == "ch02"
+
+
+def test_chapter_changed_on_disk_is_reindexed(data_dir):
+    open_store(data_dir)
+    chapter = load_chapter("ch02", str(data_dir))
+    chapter["concepts"][0]["level3_question_ids"] = [11]
+    path = data_dir / "ch02.json"
+    stat = os.stat(path)
+    write_chapter(chapter, str(data_dir))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    store = open_store(data_dir)
+    assert set(store._chapters) == {"ch02"}
+    assert store.questions_for_concept("ch02_t01") == [11]
+
+
+def test_same_size_edit_is_caught_by_mtime(data_dir):
+    open_store(data_dir)
+    path = data_dir / "ch01.json"
+    stat = os.stat(path)
+    path.write_text(path.read_text().replace("Question 2?", "Question 7?"))
+    assert os.stat(path).st_size == stat.st_size
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert "ch01" in open_store(data_dir)._chapters
+
+
+def test_commit_writes_only_touched_chapters(data_dir):
+    store = open_store(data_dir)
+    before = (data_dir / "ch02.json").stat().st_mtime_ns
+    with store.transaction():
+        store.edit(store.chapter_of_question(1))
+        store.question(1)["question"] = "Edited?"
+        # Loaded but not edited: never written
+        store.chapter("ch02")
+    assert store.touched() == set()
+    assert (data_dir / "ch02.json").stat().st_mtime_ns == before
+    assert load_chapter("ch01", str(data_dir))["chapter_questions"][0]["question"] == "Edited?"
+    content = json.loads((data_dir / "content.json").read_text())
+    assert content["chapters"][0]["chapter_questions"][0]["question"] == "Edited?"
+    assert open_store(data_dir).question(1)["question"] == "Edited?"
+
+
+def test_commit_without_edits_writes_nothing(data_dir):
+    store = open_store(data_dir)
+    store.chapters()
+    assert store.commit() == {}
+    assert not (data_dir / "content.json").exists()
+
+
+def test_add_question_allocates_ids(data_dir):
+    store = open_store(data_dir)
+    first = store.add_question("ch01", {"question": "New?", "choices": ["a", "b", "c", "d"], "correct": 1})
+    second = store.add_question("ch02", {"question": "Newer?", "choices": ["a", "b", "c", "d"], "correct": 2})
+    assert (first["id"], second["id"]) == (12, 13)
+    assert store.chapter_of_question(12) == "ch01"
+    assert set(store.commit()) == {"ch01", "ch02"}
+
+    reopened = open_store(data_dir)
+    assert reopened.question(13)["question"] == "Newer?"
+    assert reopened.next_question_id() == 14
+
+
+def test_drop_concepts_updates_lookups_before_commit(data_dir):
+    store = open_store(data_dir)
+    assert store.drop_concepts(["ch01_t01", "ch09_t01"]) == {"ch01"}
+    assert store.chapter_of_concept("ch01_t01") is None
+    assert store.concept("ch01_t01") is None
+    assert store.questions_for_concept("ch01_t01") == []
+    assert store.concepts_for_question(1) == ["ch01_t02"]
+    assert store.concepts_for_question(2) == []
+
+    store.commit()
+    reopened = open_store(data_dir)
+    for lookup in ("_concept_chapter", "_concept_questions", "_question_concepts"):
+        assert getattr(reopened, lookup) == getattr(store, lookup)
+
+
+def test_rollback_restores_disk_state(data_dir):
+    store = open_store(data_dir)
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.drop_concepts(["ch02_t01"])
+            store.add_question("ch02", {"question": "New?", "choices": ["a", "b", "c", "d"], "correct": 0})
+            raise RuntimeError("abort")
+    assert store.touched() == set()
+    assert store.chapter_of_concept("ch02_t01") == "ch02"
+    assert store.concept("ch02_t01")["term"] == "Alpha"
+    assert store.concepts_for_question(10) == ["ch02_t01", "ch02_t02"]
+    assert store.next_question_id() == 12
+    assert len(store.chapter("ch02")["chapter_questions"]) == 2
@@ -0,0 +1,162 @@
+import json
+import re
+
+import pytest
+
+import generate_questions
+from generate_questions import (
+    ChapterOutput,
+    QuestionStreamParser,
+    format_question,
+    parse_generated_questions,
+)
+from llm_runner import StubClient
+
+RESPONSE = """Here are the questions.
+
+1. A student moves abroad and feels disoriented by unfamiliar customs. What is this?
+a) Ethnocentrism
+*b) Culture shock
+c) Cultural relativism
+d) Subculture
+
+**Explanation:** The student is reacting to an unfamiliar culture.
+
+2. Which best describes judging another culture by your own standards?
+*a) Ethnocentrism
+b) Cultural relativism
+c) Counterculture
+d) Norms
+**Explanation:** Ethnocentrism uses one's own culture as the yardstick.
+
+3. Which of these is a folkway?
+a) Laws against theft
+b) Taboos
+*c) Holding a door open
+d) Mores
+"""
+
+
+def chunked(text, size):
+    parser = QuestionStreamParser()
+    questions = []
+    for start in range(0, len(text), size):
+        questions.extend(parser.feed(text[start:start + size]))
+    return questions + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 7, 40, 10_000])
+def test_streamed_questions_match_whole_response(size):
+    expected = parse_generated_questions(RESPONSE)
+    assert [q["correct"] for q in expected] == [1, 0, 2]
+    assert chunked(RESPONSE, size) == expected
+
+
+def test_question_is_returned_at_its_fourth_choice():
+    parser = QuestionStreamParser()
+    head, tail = RESPONSE.split("d) Subculture\n", 1)
+    assert parser.feed(head) == []
+    assert [q["choices"][3] for q in parser.feed("d) Subculture\n")] == ["Subculture"]
+
+
+def test_incomplete_questions_are_skipped(capsys):
+    text = "1. Too few choices?\na) One\n*b) Two\nc) Three\n\n2. No answer marked?\na) A\nb) B\nc) C\nd) D\n"
+    assert parse_generated_questions(text) == []
+    assert chunked(text, 5) == []
+    assert capsys.readouterr().out.count("SKIP") == 4
+
+
+def test_extra_choice_lines_reject_the_question():
+    text = "1. Five choices?\na) One\n*b) Two\nc) Three\nd) Four\na) Five\n\n" + RESPONSE.split("\n\n", 1)[1]
+    assert [q["question"] for q in parse_generated_questions(text)] == [
+        q["question"] for q in parse_generated_questions(RESPONSE)
+    ]
+    # Streaming has already saved it by the time the fifth line arrives
+    assert chunked(text, 10)[0]["choices"] == ["One", "Two", "Three", "Four"]
+
+
+def test_formatted_questions_parse_back():
+    questions = parse_generated_questions(RESPONSE)
+    text = "".join(format_question(q, i) for i, q in enumerate(questions, 1))
+    assert parse_generated_questions(text) == questions
+
+
+CONCEPTS = [
+    {"term": "Folkways", "definition": "Informal norms of everyday behavior"},
+    {"term": "Mores", "definition": "Norms with strong moral significance"},
+]
+
+
+def question(term, n):
+    return {"question": f"Which example shows {term.lower()} ({n})?",
+            "choices": [f"{term} {n}", "Other", "Neither", "Both"], "correct": 0}
+
+
+def test_chapter_output_resumes_where_it_stopped(tmp_path):
+    path = str(tmp_path / "03_generated.md")
+    output = ChapterOutput(path, "03 Culture")
+    assert output.needed(CONCEPTS) == CONCEPTS
+    for n in range(3):
+        assert output.add(question("Folkways", n), CONCEPTS[0])
+    assert output.add(question("Mores", 0), CONCEPTS[1])
+    assert not output.add(question("Folkways", 3), CONCEPTS[0])
+    output.finish(CONCEPTS)
+
+    resumed = ChapterOutput(path, "03 Culture")
+    assert resumed.written == 4
+    assert resumed.needed(CONCEPTS) == [CONCEPTS[1]]
+    for n in range(1, 3):
+        resumed.add(question("Mores", n), CONCEPTS[1])
+    resumed.finish(CONCEPTS)
+
+    with open(path) as f:
+        text = f.read()
+    assert text.startswith("Quiz title: 03 Culture\n")
+    assert re.findall(r"^(\d+)\.", text, re.M) == [str(n) for n in range(1, 7)]
+    assert len(parse_generated_questions(text)) == 6
+    assert not (tmp_path / "03_generated.md.progress.json").exists()
+
+
+class FakeIndex:
+    files = {generate_questions.TEXTBOOK_MAP["Culture"]: {}}
+
+    def retrieve(self, filename, concepts):
+        return [{"heading": "Norms", "text": "Norms are rules of behavior."}]
+
+    def leading(self, filename, n):
+        return []
+
+
+def test_per_concept_run_resumes_missing_concepts(tmp_path, monkeypatch):
+    content = {"chapters": [{"name": "Culture", "concepts": [
+        dict(c, level3_question_ids=[]) for c in CONCEPTS
+    ]}]}
+    content_path = tmp_path / "content.json"
+    content_path.write_text(json.dumps(content))
+    monkeypatch.setattr(generate_questions, "CONTENT_PATH", str(content_path))
+
+    prompts = []
+
+    def respond(prompt, skip=()):
+        prompts.append(prompt)
+        terms = [c["term"] for c in CONCEPTS if f"- {c['term']}:" in prompt and c["term"] not in skip]
+        return "".join(format_question(question(t, n), n + 1) for t in terms for n in range(3))
+
+    run = dict(per_concept=True, index=FakeIndex(), output_dir=str(tmp_path), requests_per_second=None)
+    # First run: the Mores request comes back empty
+    generate_questions.main(client=StubClient(lambda p: respond(p, skip=("Mores",))), **run)
+    assert (tmp_path / "03_generated.md.progress.json").exists()
+
+    prompts.clear()
+    generate_questions.main(client=StubClient(respond), **run)
+    assert len(prompts) == 1 and "- Mores:" in prompts[0] and "- Folkways:" not in prompts[0]
+    text = (tmp_path / "03_generated.md").read_text()
+    assert [q["choices"][0] for q in parse_generated_questions(text)] == [
+        "Folkways 0", "Folkways 1", "Folkways 2", "Mores 0", "Mores 1", "Mores 2",
+    ]
+    assert not (tmp_path / "03_generated.md.progress.json").exists()
+
+    # A later run finds the chapter finished
+    prompts.clear()
+    generate_questions.main(client=StubClient(respond), **run)
+    assert prompts == []
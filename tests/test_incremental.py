@@ -0,0 +1,120 @@
+import json
+import os
+
+import pytest
+
+from incremental import (
+    BuildManifest,
+    atomic_write,
+    hash_file,
+    hash_json,
+    load_chapter,
+    load_chapter_manifest,
+    splice_content,
+    write_chapter,
+    write_chapter_manifest,
+)
+
+
+def chapter(chapter_id, order, definition="A definition"):
+    return {
+        "id": chapter_id,
+        "name": f"Chapter {order}",
+        "order": order,
+        "concepts": [{"id": f"{chapter_id}_t01", "term": "Term", "definition": definition}],
+        "chapter_questions": [],
+    }
+
+
+@pytest.fixture
+def published(tmp_path):
+    """A data dir whose chapters.json points at published dist/ files and a bundle."""
+    chapters = [chapter("ch01", 1), chapter("ch02", 2)]
+    for ch in chapters:
+        write_chapter(ch, str(tmp_path))
+    manifest = [
+        {"id": ch["id"], "name": ch["name"], "order": ch["order"],
+         "file": f"dist/{ch['id']}.abc.json", "bundle": "dist/bundle.def.json"}
+        for ch in chapters
+    ]
+    (tmp_path / "chapters.json").write_text(json.dumps(manifest, indent=2))
+    return tmp_path, chapters, manifest
+
+
+def test_rewriting_the_manifest_keeps_published_entries(published):
+    data_dir, chapters, manifest = published
+    assert not write_chapter_manifest(chapters, str(data_dir))
+    assert load_chapter_manifest(str(data_dir)) == manifest
+
+
+def test_renamed_chapter_loses_its_file_and_the_bundle(published):
+    data_dir, chapters, _ = published
+    chapters[1]["name"] = "Renamed"
+    write_chapter_manifest(chapters, str(data_dir))
+    assert [sorted(entry) for entry in load_chapter_manifest(str(data_dir))] == [
+        ["file", "id", "name", "order"],
+        ["id", "name", "order"],
+    ]
+
+
+def test_rewritten_chapter_is_unpublished(published):
+    data_dir, chapters, _ = published
+    write_chapter(chapters[0], str(data_dir))  # same bytes: still published
+    assert "bundle" in load_chapter_manifest(str(data_dir))[0]
+
+    write_chapter(chapter("ch01", 1, "A new definition"), str(data_dir))
+    entries = load_chapter_manifest(str(data_dir))
+    assert "file" not in entries[0] and entries[1]["file"] == "dist/ch02.abc.json"
+    assert not any("bundle" in entry for entry in entries)
+
+
+def test_spliced_content_matches_a_full_dump(tmp_path):
+    chapters = [load_chapter(ch_info["id"]) for ch_info in load_chapter_manifest()]
+    for ch in chapters:
+        write_chapter(ch, str(tmp_path))
+    assert splice_content([ch["id"] for ch in chapters], str(tmp_path))
+    expected = json.dumps({"chapters": chapters}, indent=2).encode()
+    assert (tmp_path / "content.json").read_bytes() == expected
+
+
+def test_splice_of_no_chapters(tmp_path):
+    splice_content([], str(tmp_path))
+    assert (tmp_path / "content.json").read_bytes() == json.dumps({"chapters": []}, indent=2).encode()
+
+
+def test_atomic_write_skips_unchanged_bytes(tmp_path):
+    path = str(tmp_path / "file.json")
+    assert atomic_write(path, b"one")
+    mtime = os.stat(path).st_mtime_ns
+    assert not atomic_write(path, b"one")
+    assert os.stat(path).st_mtime_ns == mtime
+    assert atomic_write(path, b"two")
+    with open(path, "rb") as f:
+        assert f.read() == b"two"
+    assert os.listdir(tmp_path) == ["file.json"]
+
+
+def test_chapter_edited_since_the_last_run_is_dirty(tmp_path):
+    manifest_path = str(tmp_path / "build_manifest.json")
+    ch = chapter("ch01", 1)
+    inputs_hash = hash_json({"terms": ["Term"]})
+    build_manifest = BuildManifest(manifest_path)
+    assert not build_manifest.is_clean("stage", "ch01", inputs_hash)
+
+    _, output_hash = write_chapter(ch, str(tmp_path))
+    build_manifest.record("stage", "ch01", inputs_hash, output_hash)
+    build_manifest.save()
+
+    build_manifest = BuildManifest(manifest_path)
+    current = hash_file(str(tmp_path / "ch01.json"))
+    assert build_manifest.is_clean("stage", "ch01", inputs_hash, current)
+    assert not build_manifest.is_clean("stage", "ch01", hash_json({"terms": ["Other"]}), current)
+
+    # Edited by another stage or by hand
+    write_chapter(chapter("ch01", 1, "Edited by hand"), str(tmp_path))
+    edited = hash_file(str(tmp_path / "ch01.json"))
+    assert not build_manifest.is_clean("stage", "ch01", inputs_hash, edited)
+    assert build_manifest.is_clean("stage", "ch01", inputs_hash)
+
+    build_manifest.forget("stage", "ch01")
+    assert not build_manifest.is_clean("stage", "ch01", inputs_hash)
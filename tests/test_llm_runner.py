@@ -0,0 +1,103 @@
+import pytest
+
+from llm_runner import BatchRunner, StubClient, is_transient
+
+
+def make_runner(client, cache_dir, **kwargs):
+    return BatchRunner(client, model="stub", max_tokens=100, requests_per_second=None,
+                       backoff=0.001, cache_dir=cache_dir and str(cache_dir), **kwargs)
+
+
+def test_run_returns_texts_in_prompt_order(tmp_path):
+    client = StubClient(lambda prompt: prompt.upper(), latency=0.001)
+    runner = make_runner(client, tmp_path, concurrency=4)
+    prompts = [f"prompt {i}" for i in range(20)]
+    assert runner.run(prompts) == [p.upper() for p in prompts]
+    assert runner.api_calls == 20
+
+
+def test_rerun_is_served_from_cache(tmp_path):
+    client = StubClient(lambda prompt: prompt[::-1])
+    prompts = ["a", "b", "c"]
+    first = make_runner(client, tmp_path).run(prompts)
+
+    runner = make_runner(client, tmp_path)
+    assert runner.run(prompts) == first
+    assert (runner.api_calls, runner.cache_hits) == (0, 3)
+    assert client.calls == 3
+
+
+def test_interrupted_run_resumes_with_uncached_prompts(tmp_path):
+    def respond(prompt):
+        if prompt == "c" and client.calls == 3:
+            raise ValueError("interrupted")
+        return prompt * 2
+
+    client = StubClient(respond)
+    with pytest.raises(ValueError):
+        make_runner(client, tmp_path, concurrency=1).run(["a", "b", "c", "d"])
+
+    runner = make_runner(client, tmp_path, concurrency=1)
+    assert runner.run(["a", "b", "c", "d"]) == ["aa", "bb", "cc", "dd"]
+    assert (runner.api_calls, runner.cache_hits) == (2, 2)
+
+
+def test_invalid_responses_are_not_cached(tmp_path):
+    responses = iter(["truncated", "complete"])
+    client = StubClient(lambda prompt: next(responses))
+
+    def validate(index, text):
+        return text == "complete"
+
+    assert make_runner(client, tmp_path).run(["p"], validate=validate) == ["truncated"]
+    assert make_runner(client, tmp_path).run(["p"], validate=validate) == ["complete"]
+    runner = make_runner(client, tmp_path)
+    assert runner.run(["p"], validate=validate) == ["complete"]
+    assert runner.cache_hits == 1
+
+
+def test_refresh_ignores_cached_responses(tmp_path):
+    client = StubClient(lambda prompt: str(client.calls))
+    make_runner(client, tmp_path).run(["p"])
+    runner = make_runner(client, tmp_path, refresh=True)
+    assert runner.run(["p"]) == ["2"]
+    assert runner.cache_hits == 0
+    assert make_runner(client, tmp_path).run(["p"]) == ["2"]
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def test_only_transient_errors_are_retried(tmp_path):
+    failures = [RateLimitError(), APIConnectionError()]
+
+    def flaky(prompt):
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    client = StubClient(flaky)
+    assert make_runner(client, tmp_path).run(["p"]) == ["ok"]
+    assert client.calls == 3
+
+    client = StubClient(lambda prompt: (_ for _ in ()).throw(BadRequestError()))
+    with pytest.raises(BadRequestError):
+        make_runner(client, None).run(["p"])
+    assert client.calls == 1
+
+
+def test_is_transient():
+    assert is_transient(RateLimitError())
+    assert is_transient(APIConnectionError())
+    assert is_transient(TimeoutError())
+    assert not is_transient(BadRequestError())
+    assert not is_transient(KeyError("content"))
@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import math
+import random
+import statistics
+
+import pytest
+
+from progress_analytics import FULL_JSON_COLUMN, Moments, ProgressAnalytics, _iter_json_array, iter_records
+
+
+def test_moments_correlation_matches_direct_computation():
+    rng = random.Random(0)
+    xs = [rng.random() for _ in range(50)]
+    ys = [x + rng.gauss(0, 0.3) for x in xs]
+    moments = Moments()
+    for x, y in zip(xs, ys):
+        moments.add(x, y)
+    assert moments.correlation() == pytest.approx(statistics.correlation(xs, ys))
+
+
+def test_moments_correlation_is_undefined_without_variance():
+    moments = Moments()
+    assert moments.correlation() is None
+    for x in range(5):
+        moments.add(x, 1.0)
+    assert moments.correlation() is None
+
+
+def question_records(seed=1, students=40, items=6):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(students):
+        ability = rng.random()
+        questions = {}
+        for i in range(items):
+            answered = rng.randint(0, 4)
+            correct = sum(rng.random() < ability for _ in range(answered))
+            questions[f"L3_{i}"] = {"timesAnswered": answered, "timesCorrect": correct}
+        records.append({"concepts": {"c": {"level1": {"attempts": 1, "correct": 1}}},
+                        "questions": questions})
+    return records
+
+
+def test_question_stats_match_direct_computation():
+    records = question_records()
+    analytics = ProgressAnalytics([])
+    for record in records:
+        analytics.add(record)
+    stats = analytics.question_stats()
+
+    for key, result in stats.items():
+        answered = correct = 0
+        item_scores, rest_scores = [], []
+        for record in records:
+            sr = record["questions"][key]
+            if not sr["timesAnswered"]:
+                continue
+            answered += sr["timesAnswered"]
+            correct += sr["timesCorrect"]
+            others = [q for k, q in record["questions"].items() if k != key and q["timesAnswered"]]
+            rest_answered = sum(q["timesAnswered"] for q in others)
+            if rest_answered:
+                item_scores.append(sr["timesCorrect"] / sr["timesAnswered"])
+                rest_scores.append(sum(q["timesCorrect"] for q in others) / rest_answered)
+        assert result["answered"] == answered
+        assert result["p_value"] == pytest.approx(correct / answered)
+        assert result["discrimination"] == pytest.approx(statistics.correlation(item_scores, rest_scores))
+
+
+def test_planted_confusion_outranks_a_hard_independent_pair():
+    """Weak students miss both hard concepts; only one pair is actually confused."""
+    ids = [f"c{i:02d}" for i in range(20)]
+    chapters = [{"concepts": [
+        {"id": "c00", "confusable_ids": ["c01"]},  # hard, independent
+        {"id": "c02", "confusable_ids": ["c03"]},  # easy, confused by some students
+    ] + [{"id": cid} for cid in ids[4:]]}]
+    difficulty = {cid: 0.15 for cid in ids}
+    difficulty["c00"] = difficulty["c01"] = 0.5
+
+    rng = random.Random(3)
+    analytics = ProgressAnalytics(chapters)
+    for _ in range(600):
+        ability = rng.uniform(0.3, 1.7)
+        confused = rng.random() < 0.3
+        concepts = {}
+        for cid in ids:
+            p = difficulty[cid] * ability + (0.3 if confused and cid in ("c02", "c03") else 0)
+            concepts[cid] = {"level1": {"attempts": 10, "correct": sum(rng.random() > p for _ in range(10))}}
+        analytics.add({"concepts": concepts})
+
+    pairs = {(a, b): (co_error, r) for a, b, _, co_error, r in analytics.confused_pairs()}
+    # Raw co-error favours the hard pair; the partial correlation doesn't
+    assert pairs[("c00", "c01")][0] > pairs[("c02", "c03")][0]
+    assert analytics.confused_pairs()[0][:2] == ("c02", "c03")
+    assert pairs[("c02", "c03")][1] > pairs[("c00", "c01")][1]
+
+
+def test_partial_correlation_matches_direct_computation():
+    rng = random.Random(5)
+    chapters = [{"concepts": [{"id": "a", "confusable_ids": ["b"]}, {"id": "b"}, {"id": "c"}, {"id": "d"}]}]
+    analytics = ProgressAnalytics(chapters)
+    e_a, e_b, s = [], [], []
+    for _ in range(30):
+        counts = {cid: (10, rng.randint(0, 10)) for cid in "acd"}
+        counts["b"] = (10, min(10, max(0, counts["a"][1] + rng.randint(-3, 3))))
+        analytics.add({"concepts": {cid: {"level2": {"attempts": a, "correct": c}}
+                                    for cid, (a, c) in counts.items()}})
+        e_a.append(1 - counts["a"][1] / 10)
+        e_b.append(1 - counts["b"][1] / 10)
+        s.append(1 - (counts["c"][1] + counts["d"][1]) / 20)
+
+    r_ab = statistics.correlation(e_a, e_b)
+    r_as = statistics.correlation(e_a, s)
+    r_bs = statistics.correlation(e_b, s)
+    expected = (r_ab - r_as * r_bs) / math.sqrt((1 - r_as ** 2) * (1 - r_bs ** 2))
+    [(_, _, students, co_error, partial_r)] = analytics.confused_pairs(min_students=1)
+    assert students == 30
+    assert partial_r == pytest.approx(expected)
+    assert co_error == pytest.approx(sum(x * y for x, y in zip(e_a, e_b)) / 30)
+
+
+RECORDS = [
+    {"concepts": {"c1": {"level1": {"attempts": 2, "correct": 1}}}},
+    {"concepts": {"c2": {"level2": {"attempts": 1, "correct": 1}}}, "questions": {}},
+]
+
+
+def test_iter_records_reads_csv(tmp_path):
+    path = tmp_path / "progress.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Student", FULL_JSON_COLUMN])
+        writer.writeheader()
+        writer.writerow({"Student": "a", FULL_JSON_COLUMN: json.dumps(RECORDS[0])})
+        writer.writerow({"Student": "blank", FULL_JSON_COLUMN: ""})
+        writer.writerow({"Student": "b", FULL_JSON_COLUMN: json.dumps(RECORDS[1])})
+    assert list(iter_records(str(path))) == RECORDS
+
+
+def test_iter_records_reads_jsonl(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    path.write_text("\n".join([json.dumps(RECORDS[0]), "", "not json", json.dumps(RECORDS[1])]))
+    assert list(iter_records(str(path))) == RECORDS
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_records_reads_json_arrays(tmp_path, indent):
+    path = tmp_path / "progress.json"
+    items = [{FULL_JSON_COLUMN: json.dumps(RECORDS[0])}, {"concepts": {}}, RECORDS[1]]
+    path.write_text(json.dumps(items, indent=indent))
+    assert list(iter_records(str(path))) == RECORDS
+
+
+def test_json_arrays_are_decoded_in_chunks():
+    items = [{"n": i, "text": "x]," * i} for i in range(50)] + [12345, "tail"]
+    for chunk_size in (1, 3, 64):
+        assert list(_iter_json_array(io.StringIO(json.dumps(items)), chunk_size)) == items
+    with pytest.raises(ValueError):
+        list(_iter_json_array(io.StringIO('[{"a": 1}, {"b"'), 4))
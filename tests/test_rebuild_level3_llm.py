@@ -0,0 +1,65 @@
+import json
+import re
+import shutil
+
+import pytest
+
+import rebuild_level3_llm
+from content_store import ContentStore
+from incremental import DATA_DIR, BuildManifest, load_chapter_manifest
+from llm_runner import StubClient
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """Two chapters of data/ in a temp dir, with the script's state files there too."""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    manifest = load_chapter_manifest()[:2]
+    for ch_info in manifest:
+        shutil.copy(f"{DATA_DIR}/{ch_info['id']}.json", data_dir)
+    (data_dir / "chapters.json").write_text(json.dumps(manifest, indent=2))
+
+    monkeypatch.setattr(rebuild_level3_llm, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(rebuild_level3_llm, "MAPPING_PATH", str(tmp_path / "mapping.json"))
+    monkeypatch.setattr(rebuild_level3_llm, "REQUESTS_PER_SECOND", None)
+    monkeypatch.setattr(rebuild_level3_llm, "ContentStore",
+                        lambda d: ContentStore(d, str(tmp_path / "index.json")))
+    monkeypatch.setattr(rebuild_level3_llm, "BuildManifest",
+                        lambda: BuildManifest(str(tmp_path / "build_manifest.json")))
+    return tmp_path
+
+
+def respond(prompt, truncate=False):
+    """Map every question in the batch to the chapter's first concept."""
+    concept_id = re.search(r"^- (ch\d+_t\d+)", prompt, re.M).group(1)
+    lines = [f"Q{qid}: {concept_id}" for qid in re.findall(r"^Q(\d+)$", prompt, re.M)]
+    return "\n".join(lines[:-1] if truncate else lines)
+
+
+def run(repo, respond):
+    client = StubClient(respond)
+    rebuild_level3_llm.main(client=client, cache_dir=str(repo / "cache"))
+    with open(repo / "mapping.json") as f:
+        return client.calls, json.load(f)
+
+
+def test_truncated_responses_are_requeried_on_the_next_run(repo):
+    calls, mapping = run(repo, lambda prompt: respond(prompt, truncate=True))
+    assert calls > 0
+    store = ContentStore(str(repo / "data"), str(repo / "index.json"))
+    questions = sum(len(chapter["chapter_questions"]) for chapter in store.chapters())
+    assert len(mapping) < questions
+
+    rerun_calls, mapping = run(repo, respond)
+    assert rerun_calls == calls
+    assert len(mapping) == questions
+
+    # Now complete: recorded clean and served without any calls
+    assert run(repo, respond)[0] == 0
+
+
+def test_complete_run_is_clean_next_time(repo):
+    calls, mapping = run(repo, respond)
+    assert calls > 0
+    assert run(repo, lambda prompt: pytest.fail("chapter should be clean"))[1] == mapping
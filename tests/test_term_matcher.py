@@ -0,0 +1,75 @@
+import glob
+import json
+import os
+
+import pytest
+
+from incremental import DATA_DIR
+from synthetic_corpus import generate_corpus
+from term_matcher import TermMatcher, find_term_in_text, link_questions, question_text
+
+
+def reference_match(concepts, text):
+    """What the one-regex-per-term loop found: every concept whose term appears."""
+    return [c["id"] for c in concepts if find_term_in_text(c["term"], text)]
+
+
+def synthetic_chapters():
+    for chapter in generate_corpus(scale=0.5, seed=1):
+        concepts = [{"id": f"t{i:02d}", "term": t["word"]} for i, t in enumerate(chapter["terms"])]
+        yield concepts, [question_text(q) for q in chapter["questions"]]
+
+
+def real_chapters():
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "ch[0-9]*.json"))):
+        with open(path) as f:
+            chapter = json.load(f)
+        yield chapter["concepts"], [question_text(q) for q in chapter["chapter_questions"]]
+
+
+@pytest.mark.parametrize("chapters", [synthetic_chapters, real_chapters])
+def test_matcher_finds_the_same_concepts_as_find_term_in_text(chapters):
+    checked = 0
+    for concepts, texts in chapters():
+        matcher = TermMatcher(concepts)
+        for text in texts:
+            assert matcher.match(text) == reference_match(concepts, text), text
+            checked += 1
+    assert checked
+
+
+EDGE_CONCEPTS = [
+    {"id": "ses", "term": "Socioeconomic Status (SES)"},
+    {"id": "stage", "term": "Frontstage/Backstage"},
+    {"id": "role", "term": "Role"},
+    {"id": "strain", "term": "Role Strain"},
+    {"id": "short", "term": "Me"},
+    {"id": "id", "term": "Id"},
+    {"id": "self", "term": "Looking-Glass Self"},
+    {"id": "us", "term": "U.S. Census"},
+]
+
+
+@pytest.mark.parametrize("text", [
+    "Her SES rose; socioeconomic status matters.",
+    "sesame seeds and roles",
+    "The backstage area; the front stage",
+    "role-strain is not role_strain",
+    "Me, myself and I; the id and ego",
+    "the looking-glass self's reflection",
+    "u.s. census data",
+    "ROLE STRAIN!",
+    "",
+    "  role  ",
+    "Ünicode rôle strain",
+])
+def test_matcher_edge_cases(text):
+    assert TermMatcher(EDGE_CONCEPTS).match(text) == reference_match(EDGE_CONCEPTS, text)
+
+
+def test_link_questions_prefers_the_longest_term():
+    questions = [{"id": 1, "question": "An example of role strain?", "choices": ["a", "b", "c", "d"]},
+                 {"id": 2, "question": "Nothing here", "choices": ["a", "b", "c", "d"]}]
+    links, level3 = link_questions(EDGE_CONCEPTS, questions)
+    assert links == ["strain", None]
+    assert level3["strain"] == [1] and level3["role"] == [1] and level3["ses"] == []